@@ -6,6 +6,7 @@ import sys
 import os
 sys.path.append(os.path.abspath("."))
 
+from bs4 import BeautifulSoup
 from dom_extractor import DOMExtractor
 from xpath_generator import generate_xpath_from_dom
 from main import candidate_from_dom
@@ -21,11 +22,14 @@ def analyze_salesforce_html():
     
     print(f"\nHTML Size: {len(html):,} bytes ({len(html)/1024:.1f} KB)")
     
+    # Parse once and share the tree across extraction and candidate generation
+    soup = BeautifulSoup(html, "lxml")
+    
     # Extract DOM
     print("\n" + "-" * 80)
     print("1. DOM EXTRACTION (full_coverage=True)")
     print("-" * 80)
-    extractor = DOMExtractor(html)
+    extractor = DOMExtractor(html, soup=soup)
     dom_data = extractor.extract_semantic_dom(full_coverage=True)
     
     print(f"Total elements extracted: {dom_data['total_elements']}")
@@ -41,8 +45,8 @@ def analyze_salesforce_html():
         text = elem.get("text", "")
         attrs = elem.get("attributes", {})
         
-        # Check for webinar button
-        if "webinar" in text.lower() or "webinar" in str(attrs).lower():
+        # Check for webinar button (one lowered haystack per element)
+        if "webinar" in f"{text} {attrs}".lower():
             target_elements.append((idx, elem))
             print(f"\nFound at index {idx}:")
             print(f"  Tag: {elem.get('tag', 'N/A')}")
@@ -60,7 +64,7 @@ def analyze_salesforce_html():
     print("-" * 80)
     
     failed_selector = "a.cta_button[aria-label^='Watch the webinar']"
-    css_candidates = candidate_from_dom(html, failed_selector, limit=30)
+    css_candidates = candidate_from_dom(html, failed_selector, limit=30, soup=soup)
     
     print(f"Total CSS candidates generated: {len(css_candidates)}")
     print("\nTop 10 CSS candidates:")
@@ -69,11 +73,12 @@ def analyze_salesforce_html():
     
     # Check if target selector is in candidates
     target_selectors = [elem.get('selector') for _, elem in target_elements]
+    css_pos = {s: i for i, s in enumerate(css_candidates)}  # candidates are already deduped
     print(f"\nTarget selectors from DOM:")
     for ts in target_selectors:
         print(f"  - {ts}")
-        if ts in css_candidates:
-            print(f"    ✓ Found at position: {css_candidates.index(ts) + 1}")
+        if ts in css_pos:
+            print(f"    ✓ Found at position: {css_pos[ts] + 1}")
         else:
             print(f"    ❌ NOT in CSS candidates!")
     
@@ -91,11 +96,12 @@ def analyze_salesforce_html():
     
     # Check if target XPath is in candidates
     target_xpaths = [elem.get('xpath') for _, elem in target_elements]
+    xpath_pos = {x: i for i, x in enumerate(xpath_candidates)}
     print(f"\nTarget XPaths from DOM:")
     for tx in target_xpaths:
         print(f"  - {tx}")
-        if tx in xpath_candidates:
-            print(f"    ✓ Found at position: {xpath_candidates.index(tx) + 1}")
+        if tx in xpath_pos:
+            print(f"    ✓ Found at position: {xpath_pos[tx] + 1}")
         else:
             print(f"    ❌ NOT in XPath candidates!")
     
@@ -108,7 +114,8 @@ def analyze_salesforce_html():
     print(f"Total combined candidates: {len(all_candidates)}")
     
     # Check for webinar-related selectors
-    webinar_related = [c for c in all_candidates if "webinar" in c.lower() or "cta_button" in c.lower()]
+    lowered = [(c, c.lower()) for c in all_candidates]
+    webinar_related = [c for c, lc in lowered if "webinar" in lc or "cta_button" in lc]
     print(f"\nWebinar/CTA-related candidates: {len(webinar_related)}")
     for i, selector in enumerate(webinar_related[:5], 1):
         print(f"  {i}. {selector}")
@@ -137,7 +144,7 @@ def analyze_salesforce_html():
         print("   → Consider more aggressive filtering")
         print("   → Implement semantic similarity ranking")
     
-    if not any(ts in css_candidates[:10] for ts in target_selectors):
+    if not any(css_pos.get(ts, 10) < 10 for ts in target_selectors):
         print("⚠️  Target selector not in top 10 CSS candidates")
         print("   → Improve candidate scoring algorithm")
         print("   → Add semantic text matching bonus")
@@ -2,6 +2,7 @@
 Configuration management for Healer Service
 """
 import os
+import re
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -21,9 +22,16 @@ class Config:
     LLM_MAX_TOKENS = int(os.getenv("LLM_MAX_TOKENS", "800"))
     LLM_TEMPERATURE = float(os.getenv("LLM_TEMPERATURE", "0.0"))
     LLM_TIMEOUT = int(os.getenv("LLM_TIMEOUT", "60"))
+    LLM_ATTEMPT_TIMEOUT = float(os.getenv("LLM_ATTEMPT_TIMEOUT", "20"))  # Per-attempt timeout; timed-out attempts are retried
+    LLM_RETRIES = int(os.getenv("LLM_RETRIES", "2"))  # Extra attempts after a timeout (all within LLM_TIMEOUT)
+    LLM_STREAM = os.getenv("LLM_STREAM", "true").lower() == "true"  # Stream replies and stop once the JSON object is complete
+    # Longest one LLM call can run: every attempt times out, with up to 0.5s jitter between attempts
+    LLM_CALL_BUDGET = min(LLM_TIMEOUT, (LLM_RETRIES + 1) * LLM_ATTEMPT_TIMEOUT + 0.5 * LLM_RETRIES)
     
     # Database
     DB_PATH = os.getenv("DB_PATH", "healed_selectors.db")
+    ATTEMPT_FLUSH_SIZE = int(os.getenv("ATTEMPT_FLUSH_SIZE", "100"))  # Max buffered healing attempts per batch insert
+    ATTEMPT_FLUSH_INTERVAL = float(os.getenv("ATTEMPT_FLUSH_INTERVAL", "0.5"))  # Max seconds an attempt waits in the buffer
     
     # Scoring Weights
     SCORE_WEIGHT_BASE = float(os.getenv("SCORE_WEIGHT_BASE", "0.3"))
@@ -37,9 +45,24 @@ class Config:
     # Features
     ENABLE_SCREENSHOT_ANALYSIS = os.getenv("ENABLE_SCREENSHOT_ANALYSIS", "true").lower() == "true"
     ENABLE_XPATH_GENERATION = os.getenv("ENABLE_XPATH_GENERATION", "true").lower() == "true"
+    USE_SELECTOLAX = os.getenv("USE_SELECTOLAX", "false").lower() == "true"  # Validate CSS candidates with selectolax (if installed)
     
     # LLM Optimization
     MIN_LOCAL_CANDIDATES_THRESHOLD = int(os.getenv("MIN_LOCAL_CANDIDATES_THRESHOLD", "3"))  # Skip LLM if we have this many local candidates
+    RERANK_GAP_THRESHOLD = float(os.getenv("RERANK_GAP_THRESHOLD", "0.25"))  # Skip LLM re-ranking when #1 leads #2 by this much
+    HEAL_LLM_TIMEOUT = float(os.getenv("HEAL_LLM_TIMEOUT", str(LLM_CALL_BUDGET)))  # Seconds /heal waits for LLM selectors before using local ones (default leaves room for every retry)
+    HEAL_RERANK_TIMEOUT = float(os.getenv("HEAL_RERANK_TIMEOUT", "5"))  # Seconds /heal waits for the LLM re-ranking choice
+    LLM_BATCH_WINDOW_MS = float(os.getenv("LLM_BATCH_WINDOW_MS", "50"))  # Collect concurrent selector-generation and same-screenshot vision calls for this long (0 = off)
+    LLM_BATCH_MAX_SIZE = int(os.getenv("LLM_BATCH_MAX_SIZE", "8"))  # Max selectors generated (or analyzed per screenshot) in one LLM call
+    MAX_BATCH_CONCURRENCY = int(os.getenv("MAX_BATCH_CONCURRENCY", "8"))  # Selectors healed concurrently by /heal-batch
+    HEAL_TIMEOUT = float(os.getenv("HEAL_TIMEOUT", str(HEAL_LLM_TIMEOUT + HEAL_RERANK_TIMEOUT + 10)))  # Seconds one /heal-batch item may take before it is reported as failed (default outlasts the LLM waits)
+    
+    # Caching
+    DOM_CACHE_SIZE = int(os.getenv("DOM_CACHE_SIZE", "32"))  # Pages whose extracted DOM + matching engine are kept in memory
+    LLM_CACHE_SIZE = int(os.getenv("LLM_CACHE_SIZE", "10000"))  # LLM responses cached by prompt hash (0 = off)
+    LLM_CACHE_TTL = int(os.getenv("LLM_CACHE_TTL", "3600"))  # Seconds before a cached LLM response expires
+    HEAL_CACHE_SIZE = int(os.getenv("HEAL_CACHE_SIZE", "2000"))  # Healings kept for near-duplicate selector lookups (0 = off)
+    HEAL_CACHE_THRESHOLD = float(os.getenv("HEAL_CACHE_THRESHOLD", "0.92"))  # Min cosine similarity for a near-duplicate hit
     
     # Logging
     LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
@@ -52,9 +75,11 @@ class Config:
     # Volatile Patterns
     VOLATILE_PATTERNS = [
         r"data-\w{6,}",
-        r"\b(?=.*\d)[a-z0-9]{8,}\b"
+        r"\b(?=.*\d)[a-z0-9]{8,}\b",
         r"weblab", r"dingo", r"csa", r"ue", r"abtest"
     ]
+    # All volatile patterns fused into one precompiled alternation
+    VOLATILE_RE = re.compile("|".join(f"(?:{p})" for p in VOLATILE_PATTERNS))
     
     @classmethod
     def validate(cls):
@@ -1,25 +1,87 @@
 """
 Database operations and schema management
 """
+import atexit
+import queue
 import sqlite3
+import threading
+import time
 from typing import List, Optional, Dict, Any, Tuple
 from datetime import datetime, timedelta
 from config import Config
 from logger import logger
 
+_STOP = object()  # Sentinel that tells the attempt writer thread to exit
+
+_EPOCH = datetime(1970, 1, 1)
+_WEEK_US = 7 * 86400 * 1_000_000
+
+def now_us() -> int:
+    """Current UTC time as integer unix microseconds (the stored timestamp format)"""
+    return time.time_ns() // 1000
+
+def format_timestamp(ts_us: int) -> str:
+    """Format a stored unix-microsecond timestamp as a naive UTC ISO string for API responses"""
+    if isinstance(ts_us, str):
+        # Rows written under the old TEXT schema hold either digits or an ISO string
+        if not ts_us.isdigit():
+            return datetime.fromisoformat(ts_us).isoformat()
+        ts_us = int(ts_us)
+    elif not isinstance(ts_us, int):
+        raise ValueError(f"Unsupported timestamp value: {ts_us!r}")
+    return (_EPOCH + timedelta(microseconds=ts_us)).isoformat()
+
 class Database:
     """Database manager for healer service"""
     
     def __init__(self, db_path: str = None):
         self.db_path = db_path or Config.DB_PATH
+        self._local = threading.local()
+        self._connections = []
+        self._connections_lock = threading.Lock()
+        atexit.register(self.close_all)
         self.init_db()
+        
+        # healing_attempts rows are buffered and written in batches by a background thread
+        self._attempt_queue = queue.SimpleQueue()
+        self._attempt_writer = threading.Thread(
+            target=self._write_attempts_loop, name="attempt-writer", daemon=True
+        )
+        self._attempt_writer.start()
+        atexit.register(self.flush_attempts)  # Runs before close_all (atexit is LIFO)
     
     def get_connection(self):
-        """Get database connection"""
-        conn = sqlite3.connect(self.db_path)
+        """Get this thread's pooled database connection (opened on first use)"""
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            return conn
+        
+        # Autocommit mode: single statements need no explicit commit, multi-statement
+        # writes open their own transaction with BEGIN
+        conn = sqlite3.connect(self.db_path, check_same_thread=False, isolation_level=None)
         conn.row_factory = sqlite3.Row  # Enable column access by name
+        conn.executescript("""
+            PRAGMA journal_mode=WAL;
+            PRAGMA synchronous=NORMAL;
+            PRAGMA temp_store=MEMORY;
+            PRAGMA cache_size=-20000;
+        """)
+        
+        self._local.conn = conn
+        with self._connections_lock:
+            self._connections.append(conn)
         return conn
     
+    def close_all(self):
+        """Close every pooled connection (registered with atexit)"""
+        with self._connections_lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            try:
+                conn.close()
+            except Exception:
+                pass
+    
     def init_db(self):
         """Initialize database schema"""
         conn = self.get_connection()
@@ -33,7 +95,7 @@ class Database:
                 new_selector TEXT NOT NULL,
                 confidence REAL NOT NULL,
                 url TEXT,
-                timestamp TEXT NOT NULL,
+                timestamp INTEGER NOT NULL,
                 selector_type TEXT DEFAULT 'css',
                 success BOOLEAN DEFAULT NULL,
                 processing_time_ms REAL,
@@ -50,7 +112,7 @@ class Database:
                 rating TEXT NOT NULL,
                 comment TEXT,
                 actual_selector_used TEXT,
-                timestamp TEXT NOT NULL,
+                timestamp INTEGER NOT NULL,
                 FOREIGN KEY (healing_id) REFERENCES healed(id)
             )
         """)
@@ -61,13 +123,26 @@ class Database:
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
                 failed_selector TEXT NOT NULL,
                 url TEXT,
-                timestamp TEXT NOT NULL,
+                timestamp INTEGER NOT NULL,
                 success BOOLEAN NOT NULL,
                 error_message TEXT,
                 processing_time_ms REAL
             )
         """)
         
+        # Databases created before timestamps became INTEGER keep a TEXT column under
+        # CREATE TABLE IF NOT EXISTS; rebuild those tables before indexing them
+        from migrate_database import convert_timestamps_to_integer
+        cursor.execute("BEGIN")
+        try:
+            for table in ("healed", "feedback", "healing_attempts"):
+                if convert_timestamps_to_integer(cursor, table):
+                    logger.info(f"Converted {table}.timestamp to integer microseconds", extra={'request_id': 'system'})
+            cursor.execute("COMMIT")
+        except Exception:
+            cursor.execute("ROLLBACK")
+            raise
+        
         # Create indexes for better query performance
         cursor.execute("""
             CREATE INDEX IF NOT EXISTS idx_healed_old_selector 
@@ -79,15 +154,42 @@ class Database:
             ON healed(timestamp DESC)
         """)
         
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_healed_ts_conf 
+            ON healed(timestamp, confidence)
+        """)
+        
         cursor.execute("""
             CREATE INDEX IF NOT EXISTS idx_feedback_healing_id 
             ON feedback(healing_id)
         """)
         
-        conn.commit()
-        conn.close()
         logger.info("Database initialized successfully", extra={'request_id': 'system'})
     
+    _HEALING_INSERT = """
+        INSERT INTO healed 
+        (old_selector, new_selector, confidence, url, timestamp, selector_type, 
+         processing_time_ms, llm_used, screenshot_analyzed)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """
+    
+    @staticmethod
+    def _healing_params(
+        old_selector: str,
+        new_selector: str,
+        confidence: float,
+        url: str = "",
+        selector_type: str = "css",
+        processing_time_ms: float = 0,
+        llm_used: bool = True,
+        screenshot_analyzed: bool = False
+    ) -> tuple:
+        return (
+            old_selector, new_selector, confidence, url,
+            now_us(), selector_type,
+            processing_time_ms, llm_used, screenshot_analyzed
+        )
+    
     def save_healing(
         self,
         old_selector: str,
@@ -103,24 +205,36 @@ class Database:
         conn = self.get_connection()
         cursor = conn.cursor()
         
-        cursor.execute("""
-            INSERT INTO healed 
-            (old_selector, new_selector, confidence, url, timestamp, selector_type, 
-             processing_time_ms, llm_used, screenshot_analyzed)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """, (
-            old_selector, new_selector, confidence, url,
-            datetime.utcnow().isoformat(), selector_type,
+        cursor.execute(self._HEALING_INSERT, self._healing_params(
+            old_selector, new_selector, confidence, url, selector_type,
             processing_time_ms, llm_used, screenshot_analyzed
         ))
         
         healing_id = cursor.lastrowid
-        conn.commit()
-        conn.close()
         
         logger.debug(f"Saved healing record with ID: {healing_id}", extra={'request_id': 'system'})
         return healing_id
     
+    def save_healings(self, healings: List[Dict[str, Any]]) -> List[int]:
+        """Save several healing records (save_healing keyword arguments) in one transaction; return their IDs in order"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        
+        try:
+            cursor.execute("BEGIN IMMEDIATE")
+            healing_ids = []
+            for healing in healings:
+                cursor.execute(self._HEALING_INSERT, self._healing_params(**healing))
+                healing_ids.append(cursor.lastrowid)
+            conn.commit()
+        except Exception:
+            if conn.in_transaction:
+                conn.rollback()
+            raise
+        
+        logger.debug(f"Saved {len(healing_ids)} healing records", extra={'request_id': 'system'})
+        return healing_ids
+    
     def get_healing_by_selector(self, old_selector: str) -> Optional[Dict[str, Any]]:
         """Get the most recent healing for a given selector"""
         conn = self.get_connection()
@@ -134,7 +248,6 @@ class Database:
         """, (old_selector,))
         
         row = cursor.fetchone()
-        conn.close()
         
         if row:
             return dict(row)
@@ -151,27 +264,30 @@ class Database:
         conn = self.get_connection()
         cursor = conn.cursor()
         
-        cursor.execute("""
-            INSERT INTO feedback 
-            (healing_id, rating, comment, actual_selector_used, timestamp)
-            VALUES (?, ?, ?, ?, ?)
-        """, (
-            healing_id, rating, comment, actual_selector_used,
-            datetime.utcnow().isoformat()
-        ))
-        
-        feedback_id = cursor.lastrowid
-        
-        # Update success field in healed table
-        success = (rating == "positive")
-        cursor.execute("""
-            UPDATE healed 
-            SET success = ? 
-            WHERE id = ?
-        """, (success, healing_id))
-        
-        conn.commit()
-        conn.close()
+        cursor.execute("BEGIN")
+        try:
+            cursor.execute("""
+                INSERT INTO feedback 
+                (healing_id, rating, comment, actual_selector_used, timestamp)
+                VALUES (?, ?, ?, ?, ?)
+            """, (
+                healing_id, rating, comment, actual_selector_used,
+                now_us()
+            ))
+        
+            feedback_id = cursor.lastrowid
+        
+            # Update success field in healed table
+            success = (rating == "positive")
+            cursor.execute("""
+                UPDATE healed 
+                SET success = ? 
+                WHERE id = ?
+            """, (success, healing_id))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
         
         logger.info(f"Saved feedback for healing {healing_id}: {rating}", extra={'request_id': 'system'})
         return feedback_id
@@ -215,9 +331,10 @@ class Database:
         
         cursor.execute(query, params + [page_size, offset])
         rows = cursor.fetchall()
-        conn.close()
         
         items = [dict(row) for row in rows]
+        for item in items:
+            item['timestamp'] = format_timestamp(item['timestamp'])
         return items, total_count
     
     def get_stats(self) -> Dict[str, Any]:
@@ -225,19 +342,31 @@ class Database:
         conn = self.get_connection()
         cursor = conn.cursor()
         
-        # Total healings
-        cursor.execute("SELECT COUNT(*) FROM healed")
-        total_healings = cursor.fetchone()[0]
-        
-        # Feedback stats
-        cursor.execute("SELECT COUNT(*) FROM feedback")
-        total_with_feedback = cursor.fetchone()[0]
-        
-        cursor.execute("SELECT COUNT(*) FROM feedback WHERE rating = 'positive'")
-        positive_feedback = cursor.fetchone()[0]
-        
-        cursor.execute("SELECT COUNT(*) FROM feedback WHERE rating = 'negative'")
-        negative_feedback = cursor.fetchone()[0]
+        # Totals, feedback counts, recent count and average confidence in one round-trip
+        seven_days_ago = now_us() - _WEEK_US
+        cursor.execute("""
+            WITH h AS (
+                SELECT
+                    COUNT(*) AS total,
+                    AVG(confidence) AS avg_confidence,
+                    COALESCE(SUM(timestamp > ?), 0) AS recent
+                FROM healed
+            ),
+            f AS (
+                SELECT
+                    COUNT(*) AS total,
+                    COALESCE(SUM(rating = 'positive'), 0) AS positive,
+                    COALESCE(SUM(rating = 'negative'), 0) AS negative
+                FROM feedback
+            )
+            SELECT h.total, h.avg_confidence, h.recent, f.total, f.positive, f.negative
+            FROM h, f
+        """, (seven_days_ago,))
+        (
+            total_healings, avg_confidence, recent_count,
+            total_with_feedback, positive_feedback, negative_feedback
+        ) = cursor.fetchone()
+        avg_confidence = avg_confidence or 0.0
         
         # Success rate
         success_rate = 0.0
@@ -257,20 +386,6 @@ class Database:
             for row in cursor.fetchall()
         ]
         
-        # Recent healings (last 7 days)
-        seven_days_ago = (datetime.utcnow() - timedelta(days=7)).isoformat()
-        cursor.execute("""
-            SELECT COUNT(*) FROM healed 
-            WHERE timestamp > ?
-        """, (seven_days_ago,))
-        recent_count = cursor.fetchone()[0]
-        
-        # Average confidence
-        cursor.execute("SELECT AVG(confidence) FROM healed")
-        avg_confidence = cursor.fetchone()[0] or 0.0
-        
-        conn.close()
-        
         return {
             "total_healings": total_healings,
             "total_with_feedback": total_with_feedback,
@@ -290,21 +405,58 @@ class Database:
         error_message: Optional[str] = None,
         processing_time_ms: float = 0
     ):
-        """Log a healing attempt"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute("""
-            INSERT INTO healing_attempts 
-            (failed_selector, url, timestamp, success, error_message, processing_time_ms)
-            VALUES (?, ?, ?, ?, ?, ?)
-        """, (
-            failed_selector, url, datetime.utcnow().isoformat(),
+        """Queue a healing attempt for the background batch writer (non-blocking)"""
+        self._attempt_queue.put((
+            failed_selector, url, now_us(),
             success, error_message, processing_time_ms
         ))
+    
+    def _write_attempts_loop(self):
+        """Drain queued attempts, inserting up to ATTEMPT_FLUSH_SIZE rows per transaction"""
+        stopping = False
+        while not stopping:
+            row = self._attempt_queue.get()
+            if row is _STOP:
+                break
+            rows = [row]
+            deadline = time.monotonic() + Config.ATTEMPT_FLUSH_INTERVAL
+            while len(rows) < Config.ATTEMPT_FLUSH_SIZE:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    row = self._attempt_queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if row is _STOP:
+                    stopping = True
+                    break
+                rows.append(row)
+            self._insert_attempts(rows)
+    
+    def _insert_attempts(self, rows: List[tuple]):
+        """Insert a batch of healing attempts in a single transaction"""
+        conn = self.get_connection()
+        cursor = conn.cursor()
         
-        conn.commit()
-        conn.close()
+        try:
+            cursor.execute("BEGIN IMMEDIATE")
+            cursor.executemany("""
+                INSERT INTO healing_attempts 
+                (failed_selector, url, timestamp, success, error_message, processing_time_ms)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, rows)
+            conn.commit()
+        except Exception as e:
+            if conn.in_transaction:
+                conn.rollback()
+            logger.error(f"Failed to write {len(rows)} healing attempts: {e}", extra={'request_id': 'system'})
+    
+    def flush_attempts(self, timeout: float = 5.0):
+        """Stop the attempt writer after it has written everything queued (registered with atexit)"""
+        if self._attempt_writer.is_alive():
+            self._attempt_queue.put(_STOP)
+            self._attempt_writer.join(timeout)
     
     def check_connection(self) -> bool:
         """Check if database connection is working"""
@@ -312,7 +464,6 @@ class Database:
             conn = self.get_connection()
             cursor = conn.cursor()
             cursor.execute("SELECT 1")
-            conn.close()
             return True
         except Exception as e:
             logger.error(f"Database connection check failed: {e}", extra={'request_id': 'system'})
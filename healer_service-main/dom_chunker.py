@@ -0,0 +1,112 @@
+"""
+DOM snippet extraction for LLM prompts
+Keeps large pages out of the LLM context window by extracting only the
+neighbourhood of a target element.
+"""
+
+from functools import lru_cache
+from typing import List, Optional, Iterable
+import lxml.html
+from lxml import etree
+from lxml.cssselect import CSSSelector
+
+from xpath_generator import is_xpath
+from dom_pruner import preprocess_for_llm
+
+SNIPPET_MAX_HEIGHT = 3        # Max levels to climb above the target element
+SNIPPET_MAX_DESCENDANTS = 60  # Stop climbing once the subtree gets this large
+SNIPPET_MAX_ANCHORS = 5       # Local candidates tried as snippet anchors after the failed selector
+
+ASSET_TAGS = ("script", "style")
+
+
+def _serialize(element) -> str:
+    return lxml.html.tostring(element, encoding="unicode", with_tail=False)
+
+
+def _strip_assets(root):
+    """Remove scripts, styles and comments (keeping their tail text)"""
+    etree.strip_elements(root, etree.Comment, *ASSET_TAGS, with_tail=False)
+
+
+@lru_cache(maxsize=2048)
+def _compile_css(selector: str) -> CSSSelector:
+    """Compile a CSS selector once per pattern (translation to XPath is the costly part)"""
+    return CSSSelector(selector, translator="html")
+
+
+@lru_cache(maxsize=2048)
+def _compile_xpath(selector: str) -> etree.XPath:
+    """Compile an XPath expression once per pattern"""
+    return etree.XPath(selector)
+
+
+def _find_element(root, selector: str):
+    """Find the first element matching a CSS or XPath selector, or None"""
+    try:
+        if is_xpath(selector):
+            matches = _compile_xpath(selector)(root)
+        else:
+            matches = _compile_css(selector)(root)
+    except Exception:
+        return None
+    for match in matches:
+        if isinstance(match, etree._Element):
+            return match
+    return None
+
+
+def extract_snippet(
+    html: str,
+    selectors: Iterable[str],
+    max_height: int = SNIPPET_MAX_HEIGHT,
+    max_descendants: int = SNIPPET_MAX_DESCENDANTS
+) -> Optional[str]:
+    """
+    Extract the HTML neighbourhood of the first element matched by `selectors`.
+
+    The target is marked with `data-target="1"`; the snippet root is found by walking
+    up the ancestors until the height exceeds `max_height` or the subtree would exceed
+    `max_descendants` elements.
+
+    Returns:
+        Snippet HTML, or None if no selector matches an element
+    """
+    root = lxml.html.fromstring(html)
+    _strip_assets(root)
+
+    target = None
+    for selector in selectors:
+        if selector:
+            target = _find_element(root, selector)
+            if target is not None:
+                break
+    if target is None:
+        return None
+
+    target.set("data-target", "1")
+    snippet_root = target
+    for _ in range(max_height):
+        parent = snippet_root.getparent()
+        if parent is None or parent.tag in ("body", "html"):
+            break
+        if sum(1 for _ in parent.iterdescendants()) > max_descendants:
+            break
+        snippet_root = parent
+
+    return _serialize(snippet_root)
+
+
+def snippet_for_llm(html: str, selectors: List[str], max_chars: int = 3000) -> str:
+    """
+    Pruned snippet around the first matching selector, falling back to the pruned page.
+
+    A failing selector usually matches nothing, so callers pass it first followed by
+    their top local candidates. Parses the page; call it from a worker thread.
+    """
+    try:
+        snippet = extract_snippet(html, selectors) or html
+        snippet = preprocess_for_llm(snippet)
+    except Exception:
+        snippet = html
+    return snippet[:max_chars]
@@ -4,11 +4,92 @@ Provides advanced methods to extract semantic and accessibility information from
 instead of sending the full DOM to the LLM.
 """
 
-from bs4 import BeautifulSoup
-from typing import List, Dict, Any, Optional
+from bs4 import BeautifulSoup, Tag
+from typing import List, Dict, Any, Optional, Callable
+from functools import lru_cache
+import cssselect
 import json
 import re
 
+# Class-name fragments that suggest a clickable element, as one case-insensitive scan
+_CLICKABLE_CLASS_RE = re.compile(r"click|button|btn|link|menu|nav|logo|banner|card|item", re.I)
+
+
+def _attr_value(element, name: str) -> Optional[str]:
+    """Attribute value as a string (BeautifulSoup returns multi-valued attributes as lists)"""
+    value = element.get(name)
+    if isinstance(value, list):
+        return " ".join(value)
+    return value
+
+
+_ATTR_OPERATORS = {
+    "=": "_attr_value(el, {name!r}) == {value!r}",
+    "^=": "(_attr_value(el, {name!r}) or '').startswith({value!r})",
+    "$=": "(_attr_value(el, {name!r}) or '').endswith({value!r})",
+    "*=": "{value!r} in (_attr_value(el, {name!r}) or '')",
+    "~=": "{value!r} in (_attr_value(el, {name!r}) or '').split()",
+}
+
+
+def _compile_conditions(tree, conditions: List[str]) -> bool:
+    """Append Python conditions for a parsed compound selector; False if unsupported"""
+    kind = type(tree).__name__
+    if kind == "Element":
+        if tree.namespace is not None:
+            return False
+        if tree.element not in (None, "*"):
+            conditions.append(f"el.name == {tree.element.lower()!r}")
+        return True
+    if kind == "Hash":
+        conditions.append(f"el.get('id') == {tree.id!r}")
+    elif kind == "Class":
+        conditions.append(f"{tree.class_name!r} in (el.get('class') or ())")
+    elif kind == "Attrib":
+        if tree.namespace is not None or getattr(tree, "flag", None):
+            return False
+        name = tree.attrib.lower()
+        if tree.operator == "exists":
+            conditions.append(f"el.has_attr({name!r})")
+        elif tree.operator in _ATTR_OPERATORS:
+            value = tree.value.value
+            if not value and tree.operator in ("^=", "$=", "*="):
+                conditions.append("False")  # Empty substring operators never match
+            else:
+                conditions.append(_ATTR_OPERATORS[tree.operator].format(name=name, value=value))
+        else:
+            return False
+    else:
+        return False  # Combinators and pseudo-classes go through soup.select()
+    return _compile_conditions(tree.selector, conditions)
+
+
+@lru_cache(maxsize=256)
+def compile_matcher(css_sel: str) -> Optional[Callable[[Any], bool]]:
+    """
+    Generate a specialised predicate for a simple compound CSS selector.
+
+    `a.cta[aria-label^='X']` becomes a single function of chained `and` checks on a
+    BeautifulSoup tag, so matching avoids soupsieve's generic selector walk.
+
+    Returns:
+        Predicate taking a tag, or None if the selector uses unsupported syntax
+    """
+    try:
+        selectors = cssselect.parse(css_sel)
+    except cssselect.SelectorError:
+        return None
+    if len(selectors) != 1 or selectors[0].pseudo_element:
+        return None
+
+    conditions = []
+    if not _compile_conditions(selectors[0].parsed_tree, conditions):
+        return None
+    source = f"def matcher(el):\n    return {' and '.join(conditions) or 'True'}\n"
+    namespace = {"_attr_value": _attr_value}
+    exec(compile(source, f"<selector {css_sel}>", "exec"), namespace)
+    return namespace["matcher"]
+
 
 class DOMExtractor:
     """Extract semantic and accessibility information from HTML"""
@@ -61,12 +142,37 @@ class DOMExtractor:
         'data-testid', 'data-test', 'data-cy', 'data-action'
     ]
     
-    def __init__(self, html: str):
-        """Initialize with HTML content"""
-        self.soup = BeautifulSoup(html, 'html.parser')
+    def __init__(self, html: str, soup: Optional[BeautifulSoup] = None):
+        """Initialize with HTML content (reuses `soup` if the caller already parsed it)"""
+        self.soup = soup if soup is not None else BeautifulSoup(html, 'lxml')
         self.html = html # Store original HTML for size calculation
         self.element_counter = 0
     
+    def _iter_tags(self):
+        """Stream the document's tags in document order without materialising a list of them"""
+        return (node for node in self.soup.descendants if isinstance(node, Tag))
+    
+    def _select_each(self, selectors: List[str]) -> List[List[Any]]:
+        """
+        Matches for each selector, in document order.
+        Simple selectors are matched with compiled predicates in one tree walk;
+        anything else falls back to soup.select().
+        """
+        matchers = [compile_matcher(selector) for selector in selectors]
+        results = [[] for _ in selectors]
+        compiled = [(i, m) for i, m in enumerate(matchers) if m is not None]
+        
+        if compiled:
+            for element in self._iter_tags():
+                for i, matcher in compiled:
+                    if matcher(element):
+                        results[i].append(element)
+        
+        for i, matcher in enumerate(matchers):
+            if matcher is None:
+                results[i] = self.soup.select(selectors[i])
+        return results
+    
     def extract_semantic_dom(self, full_coverage: bool = False, max_elements: int = 500) -> Dict[str, Any]:
         """
         Extract semantic DOM focusing on interactive elements with optional full page coverage.
@@ -86,8 +192,7 @@ class DOMExtractor:
         elements = []
         seen_elements = set()
         
-        for selector in selectors_to_use:
-            found_elements = self.soup.select(selector)
+        for found_elements in self._select_each(selectors_to_use):
             for element in found_elements:
                 elem_id = id(element)
                 if elem_id not in seen_elements and self._is_visible(element):
@@ -98,7 +203,7 @@ class DOMExtractor:
         
         # 2. Also scan all elements for interactive heuristics (ONLY if full_coverage=True)
         if full_coverage:
-            for element in self.soup.find_all(True):
+            for element in self._iter_tags():
                 elem_id = id(element)
                 if elem_id not in seen_elements and self._is_likely_interactive(element) and self._is_visible(element):
                     elem_data = self._extract_element_data(element)
@@ -238,8 +343,7 @@ class DOMExtractor:
         """
         elements = []
         
-        for selector in self.INTERACTIVE_SELECTORS:
-            found_elements = self.soup.select(selector)
+        for found_elements in self._select_each(self.INTERACTIVE_SELECTORS):
             for element in found_elements:
                 if self._is_visible(element):
                     elem_data = {
@@ -293,8 +397,7 @@ class DOMExtractor:
         
         # Likely clickable based on class name
         classes = ' '.join(element.get('class', [])) if element.get('class') else ''
-        clickable_patterns = ['click', 'button', 'btn', 'link', 'menu', 'nav', 'logo', 'banner', 'card', 'item']
-        if any(pattern in classes.lower() for pattern in clickable_patterns):
+        if _CLICKABLE_CLASS_RE.search(classes):
             return True
         
         # Images (often clickable)
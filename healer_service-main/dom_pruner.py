@@ -0,0 +1,57 @@
+"""
+HTML pruning before sending markup to the LLM
+Removes markup that carries no selector-relevant information (head, scripts, styles,
+hidden elements, verbose attributes) so prompts are a fraction of the original size.
+"""
+
+import re
+import lxml.html
+from lxml import etree
+
+DROP_TAGS = ("head", "script", "style", "noscript", "svg", "iframe")
+
+KEEP_ATTRIBUTES = frozenset({
+    "id", "class", "name", "role", "aria-label", "data-testid",
+    "href", "type", "alt", "src",
+    # Marker added by dom_chunker
+    "data-target"
+})
+
+MAX_TEXT_LENGTH = 500
+
+_WHITESPACE_RE = re.compile(r"\s+")
+_HIDDEN_STYLE_RE = re.compile(r"display\s*:\s*none", re.I)
+
+
+def _clean_text(text: str) -> str:
+    text = _WHITESPACE_RE.sub(" ", text)
+    if len(text) > MAX_TEXT_LENGTH:
+        text = text[:MAX_TEXT_LENGTH] + "..."
+    return text
+
+
+def preprocess_for_llm(html: str) -> str:
+    """Prune HTML for use in an LLM prompt"""
+    root = lxml.html.fromstring(html)
+
+    for element in list(root.iter(etree.Comment, *DROP_TAGS)):
+        if element.getparent() is not None:
+            element.drop_tree()
+
+    hidden = [
+        el for el in root.iter(etree.Element)
+        if el is not root and _HIDDEN_STYLE_RE.search(el.get("style", ""))
+    ]
+    for element in hidden:
+        element.drop_tree()
+
+    for element in root.iter(etree.Element):
+        for attr in list(element.attrib):
+            if attr not in KEEP_ATTRIBUTES:
+                del element.attrib[attr]
+        if element.text:
+            element.text = _clean_text(element.text)
+        if element.tail:
+            element.tail = _clean_text(element.tail)
+
+    return lxml.html.tostring(root, encoding="unicode")
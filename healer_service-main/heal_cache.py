@@ -0,0 +1,104 @@
+"""
+Similarity cache for healing results
+Near-duplicate failing selectors (whitespace, attribute order, small id/class changes)
+on the same site reuse an earlier healing instead of repeating DOM analysis and LLM calls.
+"""
+import re
+import time
+from typing import Optional, Dict, Any, Tuple
+from urllib.parse import urlparse
+import numpy as np
+from sklearn.feature_extraction.text import HashingVectorizer
+
+_N_FEATURES = 2 ** 10
+
+# Character n-grams capture selector edits that word embeddings would miss; rows are
+# L2-normalised, so a dot product is the cosine similarity
+_vectorizer = HashingVectorizer(
+    analyzer="char_wb",
+    ngram_range=(2, 4),
+    n_features=_N_FEATURES,
+    alternate_sign=False,
+    norm="l2"
+)
+
+
+_COMBINATOR_SPACE_RE = re.compile(r"\s*([>+~,])\s*")
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def _normalize_selector(selector: str) -> str:
+    """Canonical spacing and quoting, so formatting-only differences embed identically"""
+    selector = _COMBINATOR_SPACE_RE.sub(r"\1", selector.strip())
+    return _WHITESPACE_RE.sub(" ", selector).replace('"', "'")
+
+
+def _host(page_url: Optional[str]) -> str:
+    return urlparse(page_url or "").netloc.lower()
+
+
+class HealCache:
+    """Bounded in-memory cache of healings, looked up by cosine similarity"""
+
+    def __init__(self, max_size: int, threshold: float):
+        self.max_size = max(max_size, 1)
+        self.threshold = threshold
+        self._vectors = np.zeros((self.max_size, _N_FEATURES), dtype=np.float32)
+        self._hosts = np.full(self.max_size, -1, dtype=np.int32)   # -1 marks a free slot
+        self._last_used = np.zeros(self.max_size, dtype=np.float64)
+        self._entries = [None] * self.max_size
+        self._host_ids: Dict[str, int] = {}
+        self._host_names: Dict[int, str] = {}  # Reverse of _host_ids, for pruning evicted hosts
+        self._next_host_id = 0
+
+    @staticmethod
+    def _embed(failed_selector: str, use_of_selector: Optional[str]) -> np.ndarray:
+        text = f"{_normalize_selector(failed_selector)}|{use_of_selector or ''}"
+        return _vectorizer.transform([text]).toarray()[0].astype(np.float32)
+
+    def get(
+        self,
+        failed_selector: str,
+        use_of_selector: Optional[str],
+        page_url: Optional[str]
+    ) -> Optional[Tuple[Dict[str, Any], float]]:
+        """Most similar cached healing for the same host, with its similarity, or None"""
+        host_id = self._host_ids.get(_host(page_url))
+        if host_id is None:
+            return None
+
+        sims = self._vectors @ self._embed(failed_selector, use_of_selector)
+        sims[self._hosts != host_id] = -1.0
+        best = int(np.argmax(sims))
+        if sims[best] < self.threshold:
+            return None
+
+        self._last_used[best] = time.monotonic()
+        return self._entries[best], float(sims[best])
+
+    def put(
+        self,
+        failed_selector: str,
+        use_of_selector: Optional[str],
+        page_url: Optional[str],
+        entry: Dict[str, Any]
+    ):
+        """Store a healing, evicting the least recently used one when full"""
+        host = _host(page_url)
+        host_id = self._host_ids.get(host)
+        if host_id is None:
+            host_id = self._host_ids[host] = self._next_host_id
+            self._host_names[host_id] = host
+            self._next_host_id += 1
+        free = np.flatnonzero(self._hosts == -1)
+        slot = int(free[0]) if len(free) else int(np.argmin(self._last_used))
+        evicted_host_id = int(self._hosts[slot])
+
+        self._vectors[slot] = self._embed(failed_selector, use_of_selector)
+        self._hosts[slot] = host_id
+        self._last_used[slot] = time.monotonic()
+        self._entries[slot] = entry
+
+        # Forget a host once its last healing is evicted, so the host map stays bounded
+        if evicted_host_id not in (-1, host_id) and not (self._hosts == evicted_host_id).any():
+            del self._host_ids[self._host_names.pop(evicted_host_id)]
@@ -0,0 +1,186 @@
+"""
+Shared async HTTP client for OpenRouter chat completion calls
+"""
+import asyncio
+import hashlib
+import json
+import random
+import time
+from typing import Optional, Dict, Any
+import httpx
+import orjson
+from cachetools import TTLCache
+from config import Config
+
+# One pooled client per process so LLM calls reuse TCP+TLS sessions
+_client: Optional[httpx.AsyncClient] = None
+
+# Responses by payload hash; identical prompts (retry storms, re-heals of the same page)
+# are answered from memory, and concurrent identical prompts share one request
+_response_cache = TTLCache(maxsize=max(Config.LLM_CACHE_SIZE, 1), ttl=Config.LLM_CACHE_TTL)
+_in_flight: Dict[str, asyncio.Future] = {}
+
+def get_client() -> httpx.AsyncClient:
+    """Get the process-wide pooled HTTP client, creating it on first use"""
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            timeout=Config.LLM_TIMEOUT,
+            http2=True,
+            limits=httpx.Limits(max_keepalive_connections=32)
+        )
+    return _client
+
+async def aclose():
+    """Close the pooled client (called on application shutdown)"""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+def _cache_key(payload: Dict[str, Any]) -> str:
+    """Stable hash of a chat completion payload (model, prompts and sampling parameters)"""
+    body = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.blake2b(body.encode("utf-8"), digest_size=16).hexdigest()
+
+def _store_response(key: str, task: asyncio.Future):
+    _in_flight.pop(key, None)
+    if not task.cancelled() and task.exception() is None:
+        _response_cache[key] = task.result()
+
+async def post_chat_completion(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    POST a chat completion payload to OpenRouter and return the decoded JSON body.
+
+    Responses are cached for LLM_CACHE_TTL seconds by payload hash (LLM_CACHE_SIZE=0
+    disables this); the returned body is shared and must not be mutated.
+    """
+    if Config.LLM_CACHE_SIZE <= 0:
+        return await _post_chat_completion(payload)
+    
+    key = _cache_key(payload)
+    cached = _response_cache.get(key)
+    if cached is not None:
+        return cached
+    
+    task = _in_flight.get(key)
+    if task is None:
+        task = asyncio.ensure_future(_post_chat_completion(payload))
+        _in_flight[key] = task
+        task.add_done_callback(lambda t: _store_response(key, t))
+    # Shielded so one caller giving up does not cancel the request for the others
+    return await asyncio.shield(task)
+
+async def _post_chat_completion(payload: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Send one chat completion request.
+
+    Slow responses are cut off after LLM_ATTEMPT_TIMEOUT and retried (with jitter) up to
+    LLM_RETRIES times, all within an overall LLM_TIMEOUT budget.
+    """
+    headers = {
+        "Authorization": f"Bearer {Config.OPENROUTER_API_KEY}",
+        "Content-Type": "application/json"
+    }
+    deadline = time.monotonic() + Config.LLM_TIMEOUT
+    
+    for attempt in range(Config.LLM_RETRIES + 1):
+        remaining = deadline - time.monotonic()
+        timeout = min(Config.LLM_ATTEMPT_TIMEOUT, remaining)
+        try:
+            if Config.LLM_STREAM:
+                return await asyncio.wait_for(_stream_json_completion(headers, payload, timeout), timeout)
+            response = await get_client().post(
+                Config.OPENROUTER_URL, headers=headers, json=payload, timeout=timeout
+            )
+        except (httpx.TimeoutException, asyncio.TimeoutError):
+            if attempt == Config.LLM_RETRIES or remaining <= Config.LLM_ATTEMPT_TIMEOUT:
+                raise
+            await asyncio.sleep(random.uniform(0, 0.5))
+            continue
+        response.raise_for_status()
+        return response.json()
+
+async def _stream_json_completion(headers: Dict[str, str], payload: Dict[str, Any], timeout: float) -> Dict[str, Any]:
+    """
+    Stream a chat completion and stop reading as soon as the reply holds a complete JSON object.
+    
+    All callers only need that object, so the rest of the generation is never waited for.
+    Returns a body shaped like a non-streamed response.
+    """
+    parts = []
+    async with get_client().stream(
+        "POST", Config.OPENROUTER_URL, headers=headers, json={**payload, "stream": True}, timeout=timeout
+    ) as response:
+        response.raise_for_status()
+        async for line in response.aiter_lines():
+            # Server-sent events; lines starting with ':' are keep-alive comments
+            if not line.startswith("data:"):
+                continue
+            data = line[5:].strip()
+            if data == "[DONE]":
+                break
+            chunk = orjson.loads(data)
+            if "error" in chunk:
+                raise ValueError(f"LLM stream error: {chunk['error']}")
+            choices = chunk.get("choices") or []
+            delta = (choices[0].get("delta") or {}).get("content") if choices else None
+            if not delta:
+                continue
+            parts.append(delta)
+            if "}" in delta:
+                try:
+                    parse_json_content("".join(parts))
+                    break  # Leaving the block closes the stream
+                except ValueError:
+                    pass
+    return {"choices": [{"message": {"role": "assistant", "content": "".join(parts)}}]}
+
+def _closing_brace(text: str, start: int) -> Optional[int]:
+    """Index of the '}' closing the object that opens at text[start], skipping braces in strings"""
+    depth = 0
+    in_string = False
+    escaped = False
+    for i in range(start, len(text)):
+        ch = text[i]
+        if in_string:
+            if escaped:
+                escaped = False
+            elif ch == "\\":
+                escaped = True
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            in_string = True
+        elif ch == "{":
+            depth += 1
+        elif ch == "}":
+            depth -= 1
+            if depth == 0:
+                return i
+    return None
+
+def parse_json_content(content: str) -> Any:
+    """
+    Decode the JSON object in an LLM reply.
+
+    Well-formed replies go straight to orjson; otherwise the first balanced {...}
+    that decodes is used (models sometimes wrap JSON in prose or code fences).
+    """
+    text = content.strip()
+    if text.startswith("{"):
+        try:
+            return orjson.loads(text)
+        except orjson.JSONDecodeError:
+            pass
+    
+    start = text.find("{")
+    while start != -1:
+        end = _closing_brace(text, start)
+        if end is None:
+            break
+        try:
+            return orjson.loads(text[start:end + 1])
+        except orjson.JSONDecodeError:
+            start = text.find("{", start + 1)
+    raise ValueError("LLM did not return valid JSON: " + content)
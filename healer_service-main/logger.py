@@ -1,7 +1,10 @@
 """
 Logging configuration and utilities
 """
+import atexit
 import logging
+import logging.handlers
+import queue
 import sys
 import uuid
 from datetime import datetime
@@ -18,7 +21,7 @@ def setup_logger():
     console_handler.setLevel(logging.INFO)
     
     # File handler
-    file_handler = logging.FileHandler(Config.LOG_FILE)
+    file_handler = logging.FileHandler(Config.LOG_FILE, delay=True)
     file_handler.setLevel(logging.DEBUG)
     
     # Formatter
@@ -30,8 +33,15 @@ def setup_logger():
     console_handler.setFormatter(formatter)
     file_handler.setFormatter(formatter)
     
-    logger.addHandler(console_handler)
-    logger.addHandler(file_handler)
+    # Request threads only enqueue records; a listener thread does the console/file I/O
+    log_queue = queue.Queue(-1)
+    logger.addHandler(logging.handlers.QueueHandler(log_queue))
+    
+    listener = logging.handlers.QueueListener(
+        log_queue, console_handler, file_handler, respect_handler_level=True
+    )
+    listener.start()
+    atexit.register(listener.stop)  # Flushes queued records on shutdown
     
     return logger
 
@@ -1,22 +1,27 @@
 # healer_service/main.py
 import os
 import json
-import requests
+import gzip
+import hashlib
+import asyncio
+import threading
 import time
-from fastapi import FastAPI, HTTPException, Query
-from fastapi.responses import HTMLResponse
-from bs4 import BeautifulSoup
+from fastapi import FastAPI, HTTPException, Query, Request, Response
+from fastapi.responses import HTMLResponse, ORJSONResponse
+from bs4 import BeautifulSoup, NavigableString
+import soupsieve as sv
 from rapidfuzz import fuzz, process
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple
 import re
 from datetime import datetime
+from functools import lru_cache
 
 # Import our new modules
 from config import Config
 from models import (
-    HealRequest, HealResponse, BatchHealRequest, BatchHealResponse,
+    HealRequest, HealResponse, BatchHealRequest, BatchHealResponse, PageHealBatchRequest,
     FeedbackRequest, FeedbackResponse, HistoryResponse, StatsResponse,
-    HealthResponse, HealingHistoryItem, SelectorType
+    HealthResponse, SelectorType
 )
 from database import db
 from logger import logger, RequestLogger, generate_request_id
@@ -25,16 +30,32 @@ from xpath_generator import (
     xpath_stability_score, xpath_semantic_score
 )
 from vision_analyzer import get_visual_context_for_healing
+from request_gzip import GzipRequestMiddleware, GzipResponseMiddleware, accepts_gzip
+from llm_client import post_chat_completion, parse_json_content, get_client as get_llm_client, aclose as close_llm_client
 from dom_extractor import DOMExtractor
+from dom_chunker import snippet_for_llm, SNIPPET_MAX_ANCHORS
 from matching_engine  import MatchingEngine
 from fastapi.middleware.cors import CORSMiddleware
+
+try:
+    from selectolax.lexbor import LexborHTMLParser
+except ImportError:
+    LexborHTMLParser = None
+
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
 import numpy as np
+import xxhash
+from cachetools import LRUCache
 import pandas as pd
 import re, json, os
 app = FastAPI(
     title="Selector Healer Service",
     description="AI-powered selector healing service for test automation",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=ORJSONResponse
 )
 
 # Add CORS middleware
@@ -46,33 +67,44 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Compress larger responses, and accept gzip-compressed request bodies (page HTML compresses ~10x)
+app.add_middleware(GzipResponseMiddleware, minimum_size=1024)
+app.add_middleware(GzipRequestMiddleware)
+
+@app.on_event("startup")
+async def open_http_client():
+    """Open the pooled HTTP client shared by all LLM calls"""
+    app.state.http = get_llm_client()
+
+@app.on_event("shutdown")
+async def close_http_client():
+    """Close the pooled LLM HTTP client"""
+    await close_llm_client()
+
 # ============================================================================
 # UTILITY FUNCTIONS
 # ============================================================================
 
-VOLATILE_PATTERNS = Config.VOLATILE_PATTERNS
-
 def is_volatile(selector: str) -> bool:
     """Check if selector contains volatile patterns"""
-    return any(re.search(p, selector) for p in VOLATILE_PATTERNS)
+    return Config.VOLATILE_RE.search(selector) is not None
+
+# (substring, weight) pairs for semantic_score, summed in this order
+_SEMANTIC_TOKENS = (
+    ("aria-", 0.3),
+    ("data-testid", 0.4),
+    (":has-text", 0.2),
+    ("#", 0.2),
+    (".", 0.1),
+)
 
+@lru_cache(maxsize=4096)
 def semantic_score(selector: str) -> float:
     """Calculate semantic score for CSS selector"""
-    score = 0.0
-    
-    if "aria-" in selector:
-        score += 0.3
-    if "data-testid" in selector:
-        score += 0.4
-    if ":has-text" in selector:
-        score += 0.2
-    if "#" in selector:
-        score += 0.2
-    if "." in selector:
-        score += 0.1
-    
+    score = sum(weight for token, weight in _SEMANTIC_TOKENS if token in selector)
     return min(score, 1.0)
 
+@lru_cache(maxsize=4096)
 def stability_score(selector: str) -> float:
     """Calculate stability score for CSS selector"""
     score = 1.0
@@ -83,15 +115,47 @@ def stability_score(selector: str) -> float:
     if ":nth-child" in selector:
         score -= 0.15
     
-    depth = selector.count(" ")
-    if depth > 3:
+    if selector.count(" ") > 3:
         score -= 0.1
     
     return max(score, 0.0)
 
-def validate_selector_in_html(selector: str, html_content: str) -> float:
+# Rightmost (key) compound selector, for the validation precheck
+_BRACKETED_RE = re.compile(r"\[[^\]]*\]|\([^)]*\)")
+_COMBINATOR_RE = re.compile(r"\s*[\s>+~]\s*")
+_KEY_TOKEN_RE = re.compile(r"[#.]([\w-]+)")
+
+# Playwright-only syntax that BeautifulSoup's CSS engine can't evaluate
+_INVALID_SELECTOR_RE = re.compile(r"\[text\(\)=|\[text\(\):|:has-text\(|:text\(|>>")
+# Selector shapes validated by a direct lookup instead of the CSS engine
+_ID_SELECTOR_RE = re.compile(r"#(-?[A-Za-z_][\w-]*)")
+_TESTID_SELECTOR_RE = re.compile(r"""\[data-testid=(['"]?)([^'"\]]+)\1\]""")
+# Numbered-list prefix the LLM sometimes puts on its choice ("2. #password")
+_NUM_PREFIX_RE = re.compile(r"^\d+\.\s*")
+
+@lru_cache(maxsize=2048)
+def _key_selector_tokens(selector: str) -> tuple:
+    """Literal id/class names of the rightmost (key) compound selector"""
+    if "," in selector or "\\" in selector:
+        return ()
+    compound = _COMBINATOR_RE.split(_BRACKETED_RE.sub("", selector.strip()))[-1]
+    return tuple(_KEY_TOKEN_RE.findall(compound))
+
+def parse_page(html_content: str):
+    """Parse a page for selector validation (selectolax when enabled and installed, else BeautifulSoup/lxml)"""
+    if Config.USE_SELECTOLAX and LexborHTMLParser is not None:
+        return LexborHTMLParser(html_content)
+    return BeautifulSoup(html_content, 'lxml')
+
+@lru_cache(maxsize=4096)
+def _compile_css(selector: str):
+    """Compile a CSS selector with soupsieve once per pattern (soup.select recompiles on each call)"""
+    return sv.compile(selector)
+
+def validate_selector_in_html(selector: str, html_content: str, soup=None) -> float:
     """
     Validate if a selector actually exists in the HTML
+    Pass `soup` (from parse_page) when validating many selectors against one page.
     Returns:
         1.0 if selector is valid and matches elements
         0.0 if selector is invalid or doesn't match
@@ -99,28 +163,33 @@ def validate_selector_in_html(selector: str, html_content: str) -> float:
     if not html_content:
         return 0.5  # Neutral score if no HTML to validate against
     
+    # Check for invalid Playwright-specific syntax in CSS selectors
+    if _INVALID_SELECTOR_RE.search(selector):
+        return 0.0  # Invalid CSS syntax
+    
+    # Key-selector precheck: an id/class that never appears in the page can't match
+    if any(token not in html_content for token in _key_selector_tokens(selector)):
+        return 0.0
+    
     try:
-        from bs4 import BeautifulSoup
-        soup = BeautifulSoup(html_content, 'html.parser')
-        
-        # Check for invalid Playwright-specific syntax in CSS selectors
-        invalid_patterns = [
-            (r'\[text\(\)=', '[text()=...]'),
-            (r'\[text\(\):', '[text():...]'),
-            (r':has-text\(', ':has-text(...)'),
-            (r':text\(', ':text(...)'),
-            (r'>>', '>>'),
-        ]
-        
-        for pattern, desc in invalid_patterns:
-            if re.search(pattern, selector):
-                return 0.0  # Invalid CSS syntax
-        
-        # Try to find elements with this selector
+        if soup is None:
+            soup = parse_page(html_content)
+        
+        # Only existence matters, so stop at the first match
         # Note: BeautifulSoup's select() only supports standard CSS
-        elements = soup.select(selector)
+        if isinstance(soup, BeautifulSoup):
+            id_match = _ID_SELECTOR_RE.fullmatch(selector)
+            testid_match = _TESTID_SELECTOR_RE.fullmatch(selector)
+            if id_match:
+                element = soup.find(id=id_match.group(1))
+            elif testid_match:
+                element = soup.find(attrs={"data-testid": testid_match.group(2)})
+            else:
+                element = _compile_css(selector).select_one(soup)
+        else:
+            element = soup.css_first(selector)
         
-        if elements and len(elements) > 0:
+        if element is not None:
             return 1.0  # Valid selector that matches elements
         else:
             return 0.0  # Selector doesn't match any elements
@@ -129,14 +198,22 @@ def validate_selector_in_html(selector: str, html_content: str) -> float:
         # If selector is malformed or causes error, it's invalid
         return 0.0
 
-def final_rerank(candidates, base_confidences, selector_types=None, html_content=None):
-    """Rank candidates using stability, semantic, validation, and base confidence scores"""
-    ranked = []
+def final_rerank(candidates, base_confidences, selector_types=None, html_content=None, soup=None):
+    """Rank candidates using stability, semantic, validation, and base confidence scores
     
+    Pass `soup` (from parse_page) to validate against an already-parsed page.
+    """
     if selector_types is None:
         selector_types = ["css"] * len(candidates)
     
-    for sel, base, sel_type in zip(candidates, base_confidences, selector_types):
+    # Parse the page once for all CSS candidates instead of once per candidate
+    if soup is None and html_content and any(
+        not (is_xpath(sel) or sel_type == "xpath") for sel, sel_type in zip(candidates, selector_types)
+    ):
+        soup = parse_page(html_content)
+    
+    scores = []  # (stable, semantic, validation) per candidate
+    for sel, sel_type in zip(candidates, selector_types):
         # Use appropriate scoring based on selector type
         if is_xpath(sel) or sel_type == "xpath":
             stable = xpath_stability_score(sel)
@@ -145,26 +222,30 @@ def final_rerank(candidates, base_confidences, selector_types=None, html_content
         else:
             stable = stability_score(sel)
             semantic = semantic_score(sel)
-            validation = validate_selector_in_html(sel, html_content)
-        
-        # If selector doesn't exist in HTML, heavily penalize it
-        if validation == 0.0:
-            # Invalid selector - set very low score
-            final = 0.1 * base  # Massive penalty
-        else:
-            # Valid selector - use normal weighted scoring
-            final = (
-                base * Config.SCORE_WEIGHT_BASE +
-                stable * Config.SCORE_WEIGHT_STABILITY +
-                semantic * Config.SCORE_WEIGHT_SEMANTIC
-            )
-        
-        ranked.append((sel, round(final, 3), stable, semantic, validation))
+            validation = validate_selector_in_html(sel, html_content, soup)
+        scores.append((stable, semantic, validation))
+    
+    if not scores:
+        return []
     
-    ranked.sort(key=lambda x: x[1], reverse=True)
-    return ranked
+    # Weighted sum for all candidates at once
+    stables, semantics, validations = np.array(scores, dtype=np.float64).T
+    bases = np.array(base_confidences[:len(scores)], dtype=np.float64)
+    final = np.where(
+        validations == 0.0,
+        0.1 * bases,  # Selector doesn't exist in HTML - massive penalty
+        bases * Config.SCORE_WEIGHT_BASE +
+        stables * Config.SCORE_WEIGHT_STABILITY +
+        semantics * Config.SCORE_WEIGHT_SEMANTIC
+    ).round(3)
+    
+    # Stable sort keeps input order among equal scores
+    return [
+        (candidates[i], float(final[i])) + scores[i]
+        for i in np.argsort(-final, kind="stable")
+    ]
 
-def call_llm_rerank(
+async def call_llm_rerank(
     candidates: List[str],
     use_of_selector: str,
     dom_data: Dict[str, Any] = None,
@@ -201,11 +282,6 @@ Which selector (by number or exact text) best matches this purpose?
 Return JSON with chosen_selector and reason.
 """
 
-    headers = {
-        "Authorization": f"Bearer {Config.OPENROUTER_API_KEY}",
-        "Content-Type": "application/json"
-    }
-    
     payload = {
         "model": Config.LLM_MODEL,
         "messages": [
@@ -220,22 +296,19 @@ Return JSON with chosen_selector and reason.
         if request_logger:
             request_logger.log_info("Calling LLM for re-ranking...")
             
-        response = requests.post(Config.OPENROUTER_URL, headers=headers, json=payload, timeout=Config.LLM_TIMEOUT)
-        response.raise_for_status()
-        
-        result = response.json()
+        result = await post_chat_completion(payload)
         content = result['choices'][0]['message']['content']
         
         if request_logger:
             request_logger.log_debug(f"LLM Re-rank Raw Response: {content}")
             
-        parsed = json.loads(content)
+        parsed = parse_json_content(content)
         chosen = parsed.get("chosen_selector")
         reason = parsed.get("reason", "No reason provided")
         
         # Strip number prefix if present (e.g., "2. #password" -> "#password")
-        if chosen and re.match(r'^\d+\.\s*', chosen):
-            chosen = re.sub(r'^\d+\.\s*', '', chosen)
+        if chosen:
+            chosen = _NUM_PREFIX_RE.sub('', chosen, count=1)
         
         if request_logger:
             request_logger.log_info(f"LLM Re-rank Parsed: chosen='{chosen}', reason='{reason}'")
@@ -258,7 +331,7 @@ Return JSON with chosen_selector and reason.
             request_logger.log_error(f"LLM Re-ranking failed: {str(e)}")
         return None
 
-def call_LLM_getfinal_selector(failed_selector, allCandidates, use_of_selector):
+async def call_LLM_getfinal_selector(failed_selector, allCandidates, use_of_selector):
     system = (
         "You are an expert web automation engineer. "
         "Given allCandidates data and a failing selector, identify robust  selectors that will match the intended element. "
@@ -271,11 +344,6 @@ def call_LLM_getfinal_selector(failed_selector, allCandidates, use_of_selector):
     )
     user = "Please find the actual candidate selector"
     
-    headers = {
-        "Authorization": f"Bearer {Config.OPENROUTER_API_KEY}",
-        "Content-Type": "application/json"
-    }
-    
     payload = {
         "model": Config.LLM_MODEL,
         "messages": [
@@ -285,21 +353,11 @@ def call_LLM_getfinal_selector(failed_selector, allCandidates, use_of_selector):
         "temperature": 0.0,
         "response_format": {"type": "json_object"}
     }
-    r = requests.post(Config.OPENROUTER_URL, headers=headers, json=payload, timeout=Config.LLM_TIMEOUT)
-    r.raise_for_status()
-    result = r.json()
+    result = await post_chat_completion(payload)
     
     # Parse model content
     content = result["choices"][0]["message"]["content"]
-    try:
-        parsed = json.loads(content)
-    except Exception:
-        # Fallback: try to extract JSON substring
-        m = re.search(r"\{.*\}", content, re.S)
-        if m:
-            parsed = json.loads(m.group(0))
-        else:
-            raise ValueError("LLM did not return valid JSON: " + content)
+    parsed = parse_json_content(content)
     
     return parsed
     
@@ -309,7 +367,7 @@ def call_LLM_getfinal_selector(failed_selector, allCandidates, use_of_selector):
     
     
 
-def call_llm_generate_selectors(
+async def call_llm_generate_selectors(
     failed_selector,
     html_snippet,
     page_url=None,
@@ -317,16 +375,18 @@ def call_llm_generate_selectors(
     screenshot_path=None,
     selector_type=SelectorType.MIXED,
     request_logger=None,
-    dom_data=None
+    dom_data=None,
+    anchor_selectors=None
 ):
     """Call LLM to generate selector candidates
     
     Args:
         dom_data: If provided, use this instead of html_snippet (76% smaller!)
+        anchor_selectors: Local candidates to centre the HTML snippet on when the failed selector matches nothing
     """
     
     # Get visual context if screenshot is provided
-    visual_context = get_visual_context_for_healing(screenshot_path, failed_selector, page_url)
+    visual_context = await get_visual_context_for_healing(screenshot_path, failed_selector, page_url)
     
     # Build prompt based on selector type
     selector_instruction = ""
@@ -402,6 +462,9 @@ def call_llm_generate_selectors(
         Return JSON.
         """
     else:
+        html_dom = await asyncio.to_thread(
+            snippet_for_llm, html_snippet, [failed_selector, *(anchor_selectors or [])[:SNIPPET_MAX_ANCHORS]]
+        )
         user = f"""
         Failed Selector: {failed_selector}
         Purpose (Use of Selector): {use_of_selector}
@@ -411,18 +474,13 @@ def call_llm_generate_selectors(
         {visual_context}
         
         HTML Snippet:
-        {html_snippet[:3000]}
+        {html_dom}
         
         Task:
         Generate/Select the best selector based on the HTML provided.
         Return JSON.
         """
        
-    headers = {
-        "Authorization": f"Bearer {Config.OPENROUTER_API_KEY}",
-        "Content-Type": "application/json"
-    }
-    
     payload = {
         "model": Config.LLM_MODEL,
         "messages": [
@@ -439,44 +497,148 @@ def call_llm_generate_selectors(
         else:
             request_logger.log_debug(f"Calling LLM with full HTML: {Config.LLM_MODEL}")
     
-    r = requests.post(Config.OPENROUTER_URL, headers=headers, json=payload, timeout=Config.LLM_TIMEOUT)
-    r.raise_for_status()
-    result = r.json()
+    result = await post_chat_completion(payload)
     
     # Parse model content
     content = result["choices"][0]["message"]["content"]
-    try:
-        parsed = json.loads(content)
-    except Exception:
-        # Fallback: try to extract JSON substring
-        m = re.search(r"\{.*\}", content, re.S)
-        if m:
-            parsed = json.loads(m.group(0))
-        else:
-            raise ValueError("LLM did not return valid JSON: " + content)
+    parsed = parse_json_content(content)
     
     return parsed
 
+async def call_llm_heal_batch(
+    selector_candidates: Dict[str, List[str]],
+    use_of_selector: Optional[Dict[str, str]] = None,
+    page_url: Optional[str] = None,
+    request_logger=None
+) -> Optional[Dict[str, List[str]]]:
+    """
+    Ask the LLM to choose replacements for several failing selectors in a single call
+    
+    Returns:
+        Mapping of failed selector -> chosen candidates (best first), or None if the
+        response could not be used and callers should fall back to local ranking
+    """
+    system = (
+        "You are an expert web automation engineer. For EACH failing selector below you are given "
+        "its purpose and a list of candidate selectors found in the DOM. Choose the best replacement "
+        "candidates for each one, best first, using only selectors from its own candidate list.\n\n"
+        "Return ONLY valid JSON mapping every failing selector to its chosen candidates:\n"
+        "{\"<failed_selector>\": [\"<best_candidate>\", \"<next_candidate>\"], ...}"
+    )
+    
+    intents = use_of_selector or {}
+    blocks = []
+    for i, (failed, cands) in enumerate(selector_candidates.items(), 1):
+        cand_lines = "\n".join(f"   - {c}" for c in cands)
+        blocks.append(
+            f"{i}. Failed Selector: {failed}\n"
+            f"   Purpose (Use of Selector): {intents.get(failed) or 'N/A'}\n"
+            f"   Candidates:\n{cand_lines}"
+        )
+    
+    user = f"Page URL: {page_url or 'N/A'}\n\n" + "\n\n".join(blocks) + "\n\nReturn the JSON object described above."
+    
+    payload = {
+        "model": Config.LLM_MODEL,
+        "messages": [
+            {"role": "system", "content": system},
+            {"role": "user", "content": user}
+        ],
+        "max_tokens": Config.LLM_MAX_TOKENS,
+        "temperature": Config.LLM_TEMPERATURE,
+        "response_format": {"type": "json_object"}
+    }
+    
+    try:
+        if request_logger:
+            request_logger.log_info(f"Calling LLM once for {len(selector_candidates)} selectors...")
+        result = await post_chat_completion(payload)
+        parsed = parse_json_content(result["choices"][0]["message"]["content"])
+    except Exception as e:
+        if request_logger:
+            request_logger.log_warning(f"Batched LLM healing failed: {e}")
+        return None
+    
+    if not isinstance(parsed, dict):
+        return None
+    
+    return {
+        failed: [c for c in (parsed.get(failed) or []) if isinstance(c, str)]
+        for failed in selector_candidates
+    }
+
+# Common words to filter out of use_of_selector text
+_STOP_WORDS = frozenset({
+    'click', 'on', 'the', 'a', 'an', 'to', 'for', 'of', 'in', 'and', 
+    'or', 'with', 'button', 'link', 'field', 'input', 'select', 'this',
+    'that', 'into', 'from', 'as'
+})
+# Words of 3+ characters; punctuation around them is never part of the token
+_WORD_RE = re.compile(r"\w[\w'-]{2,}")
+
 def extract_keywords(text):
     """Extract meaningful keywords from use_of_selector text"""
     if not text:
         return []
     
-    # Common words to filter out
-    stop_words = {
-        'click', 'on', 'the', 'a', 'an', 'to', 'for', 'of', 'in', 'and', 
-        'or', 'with', 'button', 'link', 'field', 'input', 'select', 'this',
-        'that', 'into', 'from', 'as'
-    }
-    
-    # Extract words and filter
-    words = text.lower().split()
-    keywords = [w.strip('.,!?()[]{}') for w in words if w.lower() not in stop_words and len(w) > 2]
+    return [w for w in _WORD_RE.findall(text.lower()) if w not in _STOP_WORDS]
+
+
+def _build_keyword_matcher(keywords):
+    """Return a predicate that is True if any keyword occurs in a string (Aho-Corasick if installed, else one regex)"""
+    if ahocorasick is not None and all(keywords):
+        automaton = ahocorasick.Automaton()
+        for keyword in keywords:
+            automaton.add_word(keyword, keyword)
+        automaton.make_automaton()
+        return lambda haystack: next(automaton.iter(haystack), None) is not None
     
-    return keywords
+    pattern = re.compile("|".join(map(re.escape, keywords)))
+    return lambda haystack: pattern.search(haystack) is not None
 
+def _own_text(el, max_chars=200) -> str:
+    """Text directly inside an element (not its descendants), truncated to max_chars"""
+    return "".join(c for c in el.contents if type(c) is NavigableString)[:max_chars]
 
-def candidate_from_dom(html, failed_selector, limit=30, use_of_selector=None):
+def _bounded_text(el, max_chars=200) -> str:
+    """Like el.get_text(), but stops reading descendants once max_chars of text are collected"""
+    parts = []
+    size = 0
+    for string in el.strings:
+        parts.append(string)
+        size += len(string.strip())
+        if size > max_chars:
+            break
+    return "".join(parts)
+
+def _page_elements(html, soup=None):
+    """
+    Yield (tag name, attrs, text, own-text callable) for every element of the page.
+    
+    Uses selectolax when USE_SELECTOLAX is on (and no soup was passed), else BeautifulSoup.
+    attrs always has "class" as a list, like BeautifulSoup; text is stripped and bounded.
+    """
+    if soup is None and Config.USE_SELECTOLAX and LexborHTMLParser is not None:
+        for node in LexborHTMLParser(html).root.traverse(include_text=False):
+            name = node.tag
+            if name.startswith("-") or name.startswith("_"):  # Comments / doctype
+                continue
+            attrs = node.attributes
+            if attrs.get("class"):
+                attrs["class"] = attrs["class"].split()
+            # BeautifulSoup's get_text() skips script/style contents
+            text = "" if name in ("script", "style") else (node.text(deep=True) or "").strip()
+            yield name, attrs, text, (lambda n=node: (n.text(deep=False) or "")[:200])
+        return
+    
+    if soup is None:
+        soup = BeautifulSoup(html, "lxml")
+    for el in soup.find_all(True):
+        # get_text() on every element re-reads each subtree (quadratic on nested pages),
+        # so text reads are bounded: :has-text only needs short labels
+        yield el.name, el.attrs, _bounded_text(el).strip(), (lambda el=el: _own_text(el))
+
+def candidate_from_dom(html, failed_selector, limit=30, use_of_selector=None, soup=None):
     """Create candidate list from DOM attributes heuristically
     
     Args:
@@ -484,104 +646,89 @@ def candidate_from_dom(html, failed_selector, limit=30, use_of_selector=None):
         failed_selector: The selector that failed
         limit: Maximum number of candidates to return
         use_of_selector: Optional context on how the selector is used (e.g., "click on Watch the webinar")
+        soup: Optional already-parsed BeautifulSoup of `html` to avoid re-parsing
     """
-    soup = BeautifulSoup(html, "lxml")
-    candidates = []
-    semantic_candidates = []  # Higher priority candidates from semantic matching
+    # Dicts used as ordered sets: O(1) dedupe on insert, insertion order kept
+    candidates = {}
+    semantic_candidates = {}  # Higher priority candidates from semantic matching
     
     # Extract keywords from use_of_selector for semantic search
     keywords = []
     if use_of_selector:
         keywords = extract_keywords(use_of_selector)
+    keyword_matcher = _build_keyword_matcher(keywords) if keywords else None
     
-    for el in soup.find_all(True):
+    for name, attrs, text, own_text in _page_elements(html, soup):
+        testid = attrs.get("data-testid")
+        el_id = attrs.get("id")
+        class_list = attrs.get("class")
+        classes = ".".join([c for c in class_list if c]) if class_list else ""
+        aria_label = attrs.get("aria-label")
+        title = attrs.get("title")
+        
         # Standard attribute-based candidates
-        if el.get("data-testid"):
-            candidates.append(f"[data-testid='{el.get('data-testid')}']")
-        if el.get("id"):
-            candidates.append(f"#{el.get('id')}")
-        if el.get("class"):
-            classes = ".".join([c for c in el.get("class") if c])
-            if classes:
-                candidates.append(f".{classes}")
-        
-        # Semantic matching: search for keywords in element content
-        if keywords:
-            text = (el.get_text() or "").strip().lower()
-            aria_label = (el.get("aria-label") or "").lower()
-            title = (el.get("title") or "").lower()
-            alt = (el.get("alt") or "").lower()
-            
-            # Check if any keyword matches
-            match_found = False
-            for keyword in keywords:
-                if (keyword in text or keyword in aria_label or 
-                    keyword in title or keyword in alt):
-                    match_found = True
-                    break
+        if testid:
+            candidates[f"[data-testid='{testid}']"] = None
+        if el_id:
+            candidates[f"#{el_id}"] = None
+        if classes:
+            candidates[f".{classes}"] = None
+        
+        # Semantic matching: search for keywords in the element's own content, so
+        # containers don't match on text that belongs to their descendants
+        if keyword_matcher:
+            # One scan over all searchable fields; NUL separators stop cross-field matches
+            blob = "\0".join((own_text(), aria_label or "", title or "", attrs.get("alt") or "")).lower()
             
-            if match_found:
+            if keyword_matcher(blob):
                 # Generate selector for this semantic match
                 selector = None
                 
                 # Priority 1: Use data-testid or id
-                if el.get("data-testid"):
-                    selector = f"[data-testid='{el.get('data-testid')}']"
-                elif el.get("id"):
-                    selector = f"#{el.get('id')}"
+                if testid:
+                    selector = f"[data-testid='{testid}']"
+                elif el_id:
+                    selector = f"#{el_id}"
                 # Priority 2: Use class with aria-label (fuzzy matching)
-                elif el.get("class") and el.get("aria-label"):
-                    classes = ".".join([c for c in el.get("class") if c])
+                elif class_list and aria_label:
                     if classes:
-                        # Try fuzzy matching with aria-label
-                        aria_val = el.get("aria-label")
                         # Contains match (most flexible)
-                        selector = f"{el.name}.{classes}[aria-label*='{' '.join(keywords[:2])}']"
+                        selector = f"{name}.{classes}[aria-label*='{' '.join(keywords[:2])}']"
                 # Priority 3: Use class alone
-                elif el.get("class"):
-                    classes = ".".join([c for c in el.get("class") if c])
+                elif class_list:
                     if classes:
-                        selector = f"{el.name}.{classes}"
+                        selector = f"{name}.{classes}"
                 # Priority 4: Use tag + attribute
-                elif el.get("aria-label"):
-                    aria_val = el.get("aria-label")
-                    selector = f"{el.name}[aria-label*='{' '.join(keywords[:2])}']"
-                elif el.get("title"):
-                    title_val = el.get("title")
-                    selector = f"{el.name}[title*='{' '.join(keywords[:2])}']"
+                elif aria_label:
+                    selector = f"{name}[aria-label*='{' '.join(keywords[:2])}']"
+                elif title:
+                    selector = f"{name}[title*='{' '.join(keywords[:2])}']"
                 
-                if selector and selector not in semantic_candidates:
-                    semantic_candidates.append(selector)
+                if selector:
+                    semantic_candidates[selector] = None
         
         # Element + text match (existing logic)
-        text = (el.get_text() or "").strip()
         if text and len(text) < 60:
-            candidates.append(f"{el.name}:has-text(\"{text}\")")
+            candidates[f"{name}:has-text(\"{text}\")"] = None
+        
+        # Semantic candidates come first, so once they (or, without keywords, the plain
+        # candidates) fill the limit the rest of the DOM can't change the result
+        if len(semantic_candidates) >= limit or (not keyword_matcher and len(candidates) >= limit):
+            break
     
     # Merge semantic candidates first (higher priority), then regular candidates
-    all_candidates = semantic_candidates + candidates
-    
-    # Dedupe while preserving order
-    seen = set()
-    out = []
-    for c in all_candidates:
-        if c not in seen:
-            seen.add(c)
-            out.append(c)
-        if len(out) >= limit:
-            break
+    merged = dict(semantic_candidates)
+    merged.update(candidates)
     
-    return out
+    return list(merged)[:limit]
 
 
 # ============================================================================
 # API ENDPOINTS
 # ============================================================================
 
-@app.get("/", response_class=HTMLResponse)
-async def root():
-    """API documentation landing page"""
-    html_content = """
+# The landing page never changes: encode it and hash it once at import
+_ROOT_HTML = """
     <!DOCTYPE html>
     <html>
     <head>
@@ -610,6 +757,11 @@ async def root():
             <p>Heal multiple selectors in one request</p>
         </div>
         
+        <div class="endpoint">
+            <span class="method">POST</span> <code>/heal/batch</code>
+            <p>Heal several selectors from the same page with a single LLM call</p>
+        </div>
+        
         <div class="endpoint">
             <span class="method">GET</span> <code>/history</code>
             <p>View healing history with pagination</p>
@@ -634,21 +786,57 @@ async def root():
         <p><a href="/redoc">📚 Alternative Documentation (ReDoc)</a></p>
     </body>
     </html>
-    """
-    return HTMLResponse(content=html_content)
+    """.encode("utf-8")
+_ROOT_HTML_GZ = gzip.compress(_ROOT_HTML, compresslevel=9)
+_ROOT_ETAG = hashlib.sha1(_ROOT_HTML).hexdigest()
+_ROOT_HEADERS = {
+    "Cache-Control": "public, max-age=3600",
+    "ETag": f'"{_ROOT_ETAG}"',
+    "Vary": "Accept-Encoding"
+}
+# Each encoding is a distinct representation, so it gets its own strong ETag
+_ROOT_GZ_HEADERS = {**_ROOT_HEADERS, "ETag": f'"{_ROOT_ETAG}-gz"', "Content-Encoding": "gzip"}
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    """If-None-Match check: a comma-separated list, weak comparison, '*' matches anything"""
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag == "*" or tag.removeprefix("W/") == etag:
+            return True
+    return False
+
+@app.get("/", response_class=HTMLResponse)
+async def root(request: Request):
+    """API documentation landing page"""
+    use_gzip = accepts_gzip(request.headers.get("accept-encoding", ""))
+    headers = _ROOT_GZ_HEADERS if use_gzip else _ROOT_HEADERS
+    if _etag_matches(request.headers.get("if-none-match", ""), headers["ETag"]):
+        return Response(status_code=304, headers={k: v for k, v in headers.items() if k != "Content-Encoding"})
+    # Fresh response per request (middleware may add headers) sharing the pre-encoded body
+    return HTMLResponse(content=_ROOT_HTML_GZ if use_gzip else _ROOT_HTML, headers=headers)
+
+# Health probes can arrive every second; the DB ping result is reused for this long
+_DB_CHECK_TTL = 5.0
+_last_db_check = (float("-inf"), False)
+
+def _db_connected() -> bool:
+    """db.check_connection(), rechecked at most every _DB_CHECK_TTL seconds"""
+    global _last_db_check
+    checked_at, ok = _last_db_check
+    now = time.monotonic()
+    if now - checked_at >= _DB_CHECK_TTL:
+        ok = db.check_connection()
+        _last_db_check = (now, ok)
+    return ok
+
+# Whether an LLM API key is configured (fixed for the life of the process)
+_LLM_AVAILABLE = bool(Config.OPENROUTER_API_KEY)
 
 @app.get("/health", response_model=HealthResponse)
 async def health_check():
     """Health check endpoint"""
-    db_connected = db.check_connection()
-    
-    # Check LLM API availability (simple check)
-    llm_available = True
-    try:
-        if not Config.OPENROUTER_API_KEY:
-            llm_available = False
-    except:
-        llm_available = False
+    db_connected = _db_connected()
+    llm_available = _LLM_AVAILABLE
     
     return HealthResponse(
         status="healthy" if db_connected and llm_available else "degraded",
@@ -658,25 +846,49 @@ async def health_check():
     )
 
 
+# Extracted DOM and its MatchingEngine per page, keyed by a hash of the HTML
+_dom_cache = LRUCache(maxsize=Config.DOM_CACHE_SIZE)
+_dom_cache_lock = threading.Lock()  # Callers run in worker threads; LRUCache is not thread-safe
+
+def get_page_engine(html_content: str) -> Tuple[Dict[str, Any], Optional[MatchingEngine]]:
+    """Extract the DOM and build its MatchingEngine, reusing both when the same page is sent again"""
+    key = xxhash.xxh64_intdigest(html_content.encode("utf-8"))
+    with _dom_cache_lock:
+        entry = _dom_cache.get(key)
+    if entry is None:
+        dom_data = DOMExtractor(html_content).extract_semantic_dom(full_coverage=True)
+        engine = MatchingEngine(dom_data['elements']) if dom_data['elements'] else None
+        entry = (dom_data, engine)
+        with _dom_cache_lock:
+            _dom_cache[key] = entry
+    return entry
+
 def build_custom_heal_response(
     engine_results: list,
     request_id: str,
-    processing_time: float
+    processing_time: float,
+    engine_backend: str
 ):
-    candidates = []
-
-    for r in engine_results:
-        el = r["element"]
+    # Round all scores in one vectorised call; tolist() yields plain floats for orjson
+    scores = np.round(
+        np.array(
+            [(r["score"], r["base"], r["attr"]) for r in engine_results], dtype=np.float64
+        ).reshape(-1, 3),
+        4
+    ).tolist()
 
-        candidates.append({
+    candidates = [
+        {
             "selector": r["suggested"],
-            "score": round(float(r["score"]), 4),
-            "base_score": round(float(r["base"]), 4),
-            "attribute_score": round(float(r["attr"]), 4),
-            "tag": el.get("tag"),
-            "text": el.get("text") or el.get("accessible_name"),
-            "xpath": el.get("xpath"),
-        })
+            "score": score,
+            "base_score": base,
+            "attribute_score": attr,
+            "tag": r["element"].get("tag"),
+            "text": r["element"].get("text") or r["element"].get("accessible_name"),
+            "xpath": r["element"].get("xpath"),
+        }
+        for r, (score, base, attr) in zip(engine_results, scores)
+    ]
 
     return {
         "request_id": request_id,
@@ -685,7 +897,7 @@ def build_custom_heal_response(
         "candidates": candidates,
         "debug": {
             "total_candidates": len(candidates),
-            "engine": "matching_engine_faiss",
+            "engine": f"matching_engine_{engine_backend}",
             "processing_time_ms": round(processing_time, 2)
         }
     }
@@ -695,7 +907,7 @@ def build_custom_heal_response(
 @app.post("/heal")
 async def heal(req: HealRequest):
     """Heal a single failing selector"""
-    start_time = time.time()
+    start_ns = time.perf_counter_ns()
     
     with RequestLogger("POST /heal", {"selector": req.failed_selector}) as req_logger:
         try:
@@ -712,7 +924,7 @@ async def heal(req: HealRequest):
             #         healing_id=cached['id'],
             #         metadata={
             #             "cached": True,
-            #             "processing_time_ms": (time.time() - start_time) * 1000
+            #             "processing_time_ms": (time.perf_counter_ns() - start_ns) / 1e6
             #         }
             #     )
             
@@ -723,22 +935,32 @@ async def heal(req: HealRequest):
             if req.semantic_dom:
                 # Use provided semantic DOM (76% smaller!)
                 # Generate candidates from semantic DOM elements
-                extractor = DOMExtractor(html_content)
-                dom_data = extractor.extract_semantic_dom(full_coverage=True)
-
-                engine = MatchingEngine(dom_data['elements'])
-                dom_data  = engine.rank(req.failed_selector, req.use_of_selector, top_k=2)
-                processing_time = (time.time() - start_time) * 1000
-                results = engine.rank(
+                # Parsing, extraction and ranking are CPU-bound; keep them off the event loop
+                dom_data, engine = await asyncio.to_thread(get_page_engine, html_content)
+                if engine is None:
+                    # Extraction found no elements on the page, so there is nothing to rank
+                    req_logger.log_warning("No DOM elements available to match against")
+                    response = build_custom_heal_response(
+                        engine_results=[],
+                        request_id=req_logger.request_id,
+                        processing_time=(time.perf_counter_ns() - start_ns) / 1e6,
+                        engine_backend="none"
+                    )
+                    response["message"] = "No DOM elements available to match against"
+                    return response
+                results = await asyncio.to_thread(
+                    engine.rank,
                     req.failed_selector,
                     req.use_of_selector,
                     top_k=5
                 )
+                processing_time = (time.perf_counter_ns() - start_ns) / 1e6
 
                 response = build_custom_heal_response(
                     engine_results=results,
                     request_id=req_logger.request_id,
-                    processing_time=processing_time
+                    processing_time=processing_time,
+                    engine_backend=engine.backend
                 )
 
                 return response
@@ -750,44 +972,74 @@ async def heal(req: HealRequest):
                 url=req.page_url or "",
                 success=False,
                 error_message=str(e),
-                processing_time_ms=(time.time() - start_time) * 1000
+                processing_time_ms=(time.perf_counter_ns() - start_ns) / 1e6
             )
             raise HTTPException(status_code=500, detail=f"Healing failed: {str(e)}")
 
 @app.post("/heal-batch", response_model=BatchHealResponse)
 async def heal_batch(req: BatchHealRequest):
     """Heal multiple selectors in batch"""
-    start_time = time.time()
+    start_ns = time.perf_counter_ns()
     
     with RequestLogger("POST /heal-batch", {"count": len(req.selectors)}) as req_logger:
-        results = []
-        succeeded = 0
-        failed = 0
-        
-        for heal_req in req.selectors:
-            try:
-                result = await heal(heal_req)
-                results.append(result)
-                if result.chosen:
-                    succeeded += 1
-                else:
-                    failed += 1
-            except Exception as e:
-                req_logger.log_error(f"Batch item failed: {e}")
-                failed += 1
-                # Add error result
-                results.append(HealResponse(
-                    request_id=req_logger.request_id,
-                    candidates=[],
-                    confidence_scores=[],
-                    chosen=None,
-                    message=f"Failed: {str(e)}",
-                    metadata={"error": str(e)}
-                ))
+        # Heal items concurrently (their LLM calls overlap); the semaphore caps in-flight heals
+        semaphore = asyncio.Semaphore(Config.MAX_BATCH_CONCURRENCY)
+        
+        async def heal_one(heal_req):
+            async with semaphore:
+                try:
+                    # Per-item budget, so one stuck item cannot hold up the rest of the batch
+                    result = await asyncio.wait_for(heal(heal_req), Config.HEAL_TIMEOUT)
+                    if result is None:
+                        # heal only ranks against a semantic DOM; without one there is no result
+                        return HealResponse.model_construct(
+                            request_id=req_logger.request_id,
+                            candidates=[],
+                            confidence_scores=[],
+                            chosen=None,
+                            message="Failed: semantic_dom is required",
+                            metadata={"error": "semantic_dom is required"}
+                        ), False
+                    # heal returns the custom candidate format; flatten it into a HealResponse
+                    candidates = result["candidates"]
+                    return HealResponse.model_construct(
+                        request_id=result["request_id"],
+                        candidates=[c["selector"] for c in candidates],
+                        confidence_scores=[c["score"] for c in candidates],
+                        chosen=result.get("chosen"),
+                        message=result["message"],
+                        metadata=result["debug"]
+                    ), bool(result.get("chosen"))
+                except asyncio.TimeoutError:
+                    req_logger.log_error(f"Batch item timed out after {Config.HEAL_TIMEOUT}s: {heal_req.failed_selector}")
+                    return HealResponse.model_construct(
+                        request_id=req_logger.request_id,
+                        candidates=[],
+                        confidence_scores=[],
+                        chosen=None,
+                        message=f"Failed: timed out after {Config.HEAL_TIMEOUT}s",
+                        metadata={"error": "timeout"}
+                    ), False
+                except Exception as e:
+                    req_logger.log_error(f"Batch item failed: {e}")
+                    # Add error result
+                    return HealResponse.model_construct(
+                        request_id=req_logger.request_id,
+                        candidates=[],
+                        confidence_scores=[],
+                        chosen=None,
+                        message=f"Failed: {str(e)}",
+                        metadata={"error": str(e)}
+                    ), False
         
-        processing_time = (time.time() - start_time) * 1000
+        outcomes = await asyncio.gather(*(heal_one(heal_req) for heal_req in req.selectors))
+        results = [result for result, _ in outcomes]
+        succeeded = sum(1 for _, ok in outcomes if ok)
+        failed = len(outcomes) - succeeded
         
-        return BatchHealResponse(
+        processing_time = (time.perf_counter_ns() - start_ns) / 1e6
+        
+        return BatchHealResponse.model_construct(
             request_id=req_logger.request_id,
             results=results,
             total_processed=len(req.selectors),
@@ -796,6 +1048,87 @@ async def heal_batch(req: BatchHealRequest):
             processing_time_ms=round(processing_time, 2)
         )
 
+@app.post("/heal/batch", response_model=BatchHealResponse)
+async def heal_page_batch(req: PageHealBatchRequest):
+    """Heal several failing selectors from one page with one DOM pass and one LLM call"""
+    start_ns = time.perf_counter_ns()
+    
+    with RequestLogger("POST /heal/batch", {"count": len(req.selectors)}) as req_logger:
+        try:
+            # Extract the DOM and build the matching index once for the whole batch
+            elements = (req.semantic_dom or {}).get('elements')
+            engine = None
+            if not elements and req.html:
+                dom_data, engine = await asyncio.to_thread(get_page_engine, req.html)
+                elements = dom_data['elements']
+            if not elements:
+                raise ValueError("No DOM elements available to match against")
+            
+            intents = req.use_of_selector or {}
+            top_k = min(5, len(elements))
+            
+            def rank_all():
+                # Index building and ranking are CPU-bound; run in a worker thread
+                page_engine = engine if engine is not None else MatchingEngine(elements)
+                return page_engine.backend, {
+                    sel: page_engine.rank(sel, intents.get(sel) or "", top_k=top_k)
+                    for sel in req.selectors
+                }
+            
+            engine_backend, ranked = await asyncio.to_thread(rank_all)
+            selector_candidates = {
+                sel: [r["suggested"] for r in results]
+                for sel, results in ranked.items()
+            }
+            
+            llm_choices = await call_llm_heal_batch(
+                selector_candidates,
+                use_of_selector=intents,
+                page_url=req.page_url,
+                request_logger=req_logger
+            )
+            if llm_choices is None:
+                req_logger.log_warning("Falling back to per-selector matching engine ranking")
+            
+            results = []
+            succeeded = 0
+            for sel in req.selectors:
+                scores = {}
+                for r in ranked[sel]:
+                    scores.setdefault(r["suggested"], round(float(r["score"]), 4))
+                
+                chosen_by_llm = (llm_choices or {}).get(sel, [])
+                candidates = list(dict.fromkeys(chosen_by_llm + selector_candidates[sel]))
+                chosen = candidates[0] if candidates else None
+                if chosen:
+                    succeeded += 1
+                
+                results.append(HealResponse.model_construct(
+                    request_id=req_logger.request_id,
+                    candidates=candidates,
+                    confidence_scores=[scores.get(c, 0.5) for c in candidates],
+                    chosen=chosen,
+                    message="Smart Healed" if chosen else "No candidates found",
+                    metadata={
+                        "llm_used": llm_choices is not None,
+                        "engine": f"matching_engine_{engine_backend}"
+                    }
+                ))
+            
+            processing_time = (time.perf_counter_ns() - start_ns) / 1e6
+            
+            return BatchHealResponse.model_construct(
+                request_id=req_logger.request_id,
+                results=results,
+                total_processed=len(req.selectors),
+                total_succeeded=succeeded,
+                total_failed=len(req.selectors) - succeeded,
+                processing_time_ms=round(processing_time, 2)
+            )
+        except Exception as e:
+            req_logger.log_error(f"Batch healing failed: {e}", exc_info=True)
+            raise HTTPException(status_code=500, detail=f"Batch healing failed: {str(e)}")
+
 @app.get("/history", response_model=HistoryResponse)
 async def get_history(
     page: int = Query(1, ge=1, description="Page number"),
@@ -805,31 +1138,33 @@ async def get_history(
     """Get healing history with pagination"""
     with RequestLogger("GET /history") as req_logger:
         try:
-            items, total_count = db.get_history(page, page_size, url_filter)
+            items, total_count = await asyncio.to_thread(db.get_history, page, page_size, url_filter)
             
+            # Rows come from our own database, so they are encoded directly with orjson instead of
+            # being validated into HealingHistoryItem models (HistoryResponse still documents the shape)
             history_items = [
-                HealingHistoryItem(
-                    id=item['id'],
-                    old_selector=item['old_selector'],
-                    new_selector=item['new_selector'],
-                    confidence=item['confidence'],
-                    url=item['url'],
-                    timestamp=item['timestamp'],
-                    feedback_rating=item.get('feedback_rating'),
-                    feedback_comment=item.get('feedback_comment')
-                )
+                {
+                    "id": item['id'],
+                    "old_selector": item['old_selector'],
+                    "new_selector": item['new_selector'],
+                    "confidence": item['confidence'],
+                    "url": item['url'] or "",
+                    "timestamp": item['timestamp'],
+                    "feedback_rating": item.get('feedback_rating'),
+                    "feedback_comment": item.get('feedback_comment')
+                }
                 for item in items
             ]
             
             has_more = (page * page_size) < total_count
             
-            return HistoryResponse(
-                items=history_items,
-                total_count=total_count,
-                page=page,
-                page_size=page_size,
-                has_more=has_more
-            )
+            return ORJSONResponse({
+                "items": history_items,
+                "total_count": total_count,
+                "page": page,
+                "page_size": page_size,
+                "has_more": has_more
+            })
         except Exception as e:
             req_logger.log_error(f"Failed to get history: {e}", exc_info=True)
             raise HTTPException(status_code=500, detail=str(e))
@@ -839,7 +1174,7 @@ async def get_stats():
     """Get healing statistics"""
     with RequestLogger("GET /stats") as req_logger:
         try:
-            stats = db.get_stats()
+            stats = await asyncio.to_thread(db.get_stats)
             return StatsResponse(**stats)
         except Exception as e:
             req_logger.log_error(f"Failed to get stats: {e}", exc_info=True)
@@ -850,7 +1185,8 @@ async def submit_feedback(req: FeedbackRequest):
     """Submit feedback on a healed selector"""
     with RequestLogger("POST /feedback", {"healing_id": req.healing_id}) as req_logger:
         try:
-            feedback_id = db.save_feedback(
+            feedback_id = await asyncio.to_thread(
+                db.save_feedback,
                 healing_id=req.healing_id,
                 rating=req.rating.value,
                 comment=req.comment,
@@ -18,6 +18,8 @@ Usage (Colab):
 """
 
 from typing import List, Dict, Any, Optional, Tuple
+from array import array
+from collections import defaultdict
 import numpy as np
 import pandas as pd
 import re, json, os
@@ -43,6 +45,14 @@ from sklearn.metrics.pairwise import cosine_similarity
 from sklearn.neighbors import NearestNeighbors
 
 
+# Final rank score = RANK_WEIGHT_SIMILARITY * retrieval similarity + RANK_WEIGHT_ATTR * attribute score
+RANK_WEIGHT_SIMILARITY = 0.7
+RANK_WEIGHT_ATTR = 0.3
+
+_ID_RE = re.compile(r"#([\w\-]+)")
+_CLASS_RE = re.compile(r"\.([\w\-]+)")
+
+
 # ---------- Helper utilities ----------
 def normalize_text(s: str) -> str:
     if not s:
@@ -58,9 +68,10 @@ def safe_str(x: Any) -> str:
         return " ".join([f"{k} {v}" for k, v in x.items() if v])
     return str(x)
 
-def overlap_ratio(a: str, b: str) -> float:
-    a_tokens = set(normalize_text(a).lower().split())
-    b_tokens = set(normalize_text(b).lower().split())
+def token_set(s: str) -> frozenset:
+    return frozenset(normalize_text(s).lower().split())
+
+def token_overlap(a_tokens: frozenset, b_tokens: frozenset) -> float:
     if not a_tokens or not b_tokens:
         return 0
     return len(a_tokens & b_tokens) / len(a_tokens | b_tokens)
@@ -135,6 +146,17 @@ class MatchingEngine:
         self.use_sbert = use_sbert and _USE_SBERT
         self.use_faiss = use_faiss and _USE_FAISS
 
+        # Inverted index: element positions by id / class (the tokens rank() matches on)
+        self._build_index()
+
+        # Lowercased aria-label / href token sets, computed once instead of per rank() call
+        self._label_tokens = []
+        self._href_tokens = []
+        for el in elements:
+            attrs = el.get("attributes", {})
+            self._label_tokens.append(token_set(attrs.get("aria-label") or ""))
+            self._href_tokens.append(token_set(attrs.get("href") or ""))
+
         # Build corpus
         self.corpus_texts = [flatten_element(el) for el in elements]
 
@@ -164,6 +186,22 @@ class MatchingEngine:
             self.faiss_ok = False
             self.nn = NearestNeighbors(metric="cosine").fit(self.embeddings)
 
+    @property
+    def backend(self) -> str:
+        """Retrieval backend actually in use ("faiss", or "sklearn" when FAISS is unavailable or failed)"""
+        return "faiss" if self.faiss_ok else "sklearn"
+
+    def _build_index(self):
+        by_id = defaultdict(lambda: array("i"))
+        by_class = defaultdict(lambda: array("i"))
+        for i, el in enumerate(self.elements):
+            attrs = el.get("attributes") or {}
+            if attrs.get("id"):
+                by_id[attrs["id"]].append(i)
+            for cls in set((attrs.get("class") or "").split()):
+                by_class[cls].append(i)
+        self.by_id, self.by_class = dict(by_id), dict(by_class)
+
     def embed_query(self, selector: str, semantic: str) -> np.ndarray:
         q = f"selector: {selector} ||| semantic: {semantic}"
         if self.use_sbert:
@@ -183,27 +221,22 @@ class MatchingEngine:
             sim = 1 - dist[0]
             return idxs[0], sim
 
-    def attribute_score(self, el, selector, semantic):
-        attrs = el.get("attributes", {})
+    @staticmethod
+    def _attribute_score(label_tokens, href_tokens, id_match, class_match, semantic_tokens):
         score = 0
 
         # id match
-        found = re.search(r"#([\w\-]+)", selector or "")
-        if found and attrs.get("id") == found.group(1):
+        if id_match:
             score += 0.6
 
         # aria-label meaning
-        if attrs.get("aria-label"):
-            score += 0.3 * overlap_ratio(attrs["aria-label"], semantic)
+        score += 0.3 * token_overlap(label_tokens, semantic_tokens)
 
         # href overlap
-        if attrs.get("href"):
-            score += 0.2 * overlap_ratio(attrs["href"], semantic)
+        score += 0.2 * token_overlap(href_tokens, semantic_tokens)
 
         # class overlap
-        cls_tokens = set((attrs.get("class") or "").split())
-        sel_cls = set(re.findall(r"\.([\w\-]+)", selector or ""))
-        if cls_tokens & sel_cls:
+        if class_match:
             score += 0.2
 
         return min(1, score)
@@ -212,23 +245,41 @@ class MatchingEngine:
         qvec = self.embed_query(selector, semantic)
         idxs, sims = self.retrieve(qvec, top_k)
 
+        # Parse the selector once and resolve its id/class tokens through the index
+        found = _ID_RE.search(selector or "")
+        id_hits = set(self.by_id.get(found.group(1), ())) if found else set()
+        class_hits = set()
+        for cls in set(_CLASS_RE.findall(selector or "")):
+            class_hits.update(self.by_class.get(cls, ()))
+
+        semantic_tokens = token_set(semantic or "")
+
+        base = np.asarray(sims, dtype=np.float64)
+        attr = np.fromiter(
+            (
+                self._attribute_score(
+                    self._label_tokens[idx], self._href_tokens[idx],
+                    idx in id_hits, idx in class_hits, semantic_tokens
+                )
+                for idx in idxs
+            ),
+            dtype=np.float64,
+            count=len(idxs),
+        )
+        final = RANK_WEIGHT_SIMILARITY * base + RANK_WEIGHT_ATTR * attr
+
         results = []
-        for i, idx in enumerate(idxs):
+        for i in np.argsort(-final, kind="stable"):
+            idx = idxs[i]
             el = self.elements[idx]
-            base = float(sims[i])
-            attr = self.attribute_score(el, selector, semantic)
-            final = 0.7 * base + 0.3 * attr
-
             results.append(
                 dict(
                     index=idx,
-                    score=final,
-                    base=base,
-                    attr=attr,
+                    score=float(final[i]),
+                    base=float(base[i]),
+                    attr=float(attr[i]),
                     element=el,
                     suggested=build_css_from_element(el),
                 )
             )
-
-        results.sort(key=lambda x: -x["score"])
-        return results
\ No newline at end of file
+        return results
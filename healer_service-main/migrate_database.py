@@ -6,6 +6,7 @@ Migrates old database schema to new schema with additional columns
 
 import sqlite3
 import os
+import re
 from datetime import datetime
 
 DB_PATH = "healed_selectors.db"
@@ -26,6 +27,42 @@ def check_column_exists(cursor, table, column):
     columns = [row[1] for row in cursor.fetchall()]
     return column in columns
 
+# Old TEXT rows hold either digit strings (already microseconds) or naive ISO strings.
+# strftime('%f') only keeps milliseconds, so the fraction is read with substr instead
+_TIMESTAMP_TO_US = (
+    "CASE WHEN timestamp <> '' AND timestamp NOT GLOB '*[^0-9]*' THEN CAST(timestamp AS INTEGER)"
+    " ELSE CAST(strftime('%s', timestamp) AS INTEGER) * 1000000"
+    " + CASE WHEN instr(timestamp, '.') > 0"
+    " THEN CAST(substr(substr(timestamp, instr(timestamp, '.') + 1) || '000000', 1, 6) AS INTEGER)"
+    " ELSE 0 END END"
+)
+
+def convert_timestamps_to_integer(cursor, table):
+    """
+    Rebuild `table` so `timestamp` is INTEGER unix microseconds instead of ISO TEXT.
+    A column declared TEXT would coerce integers back to text, so an in-place UPDATE is not enough.
+    """
+    cursor.execute(f"PRAGMA table_info({table})")
+    columns = cursor.fetchall()
+    if not any(row[1] == "timestamp" and row[2].upper() == "TEXT" for row in columns):
+        return False
+    
+    cursor.execute("SELECT sql FROM sqlite_master WHERE type='table' AND name=?", (table,))
+    create_sql = cursor.fetchone()[0]
+    create_sql = re.sub(r"timestamp\s+TEXT", "timestamp INTEGER", create_sql, count=1)
+    create_sql = create_sql.replace(table, f"{table}_new", 1)
+    
+    names = [row[1] for row in columns]
+    select_cols = ", ".join(
+        _TIMESTAMP_TO_US if name == "timestamp" else name
+        for name in names
+    )
+    cursor.execute(create_sql)
+    cursor.execute(f"INSERT INTO {table}_new ({', '.join(names)}) SELECT {select_cols} FROM {table}")
+    cursor.execute(f"DROP TABLE {table}")
+    cursor.execute(f"ALTER TABLE {table}_new RENAME TO {table}")
+    return True
+
 def migrate_database():
     """Migrate database to new schema"""
     print("Starting database migration...")
@@ -37,6 +74,12 @@ def migrate_database():
     conn = sqlite3.connect(DB_PATH)
     cursor = conn.cursor()
     
+    # WAL persists in the database file, so the service starts in WAL mode after migrating;
+    # the rest speed up the table rebuilds below
+    for pragma in ("journal_mode=WAL", "synchronous=NORMAL", "temp_store=MEMORY",
+                   "mmap_size=268435456", "cache_size=-65536"):
+        cursor.execute(f"PRAGMA {pragma}")
+    
     # Check if healed table exists
     cursor.execute("SELECT name FROM sqlite_master WHERE type='table' AND name='healed'")
     if not cursor.fetchone():
@@ -76,7 +119,7 @@ def migrate_database():
                 rating TEXT NOT NULL,
                 comment TEXT,
                 actual_selector_used TEXT,
-                timestamp TEXT NOT NULL,
+                timestamp INTEGER NOT NULL,
                 FOREIGN KEY (healing_id) REFERENCES healed(id)
             )
         """)
@@ -90,7 +133,7 @@ def migrate_database():
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
                 failed_selector TEXT NOT NULL,
                 url TEXT,
-                timestamp TEXT NOT NULL,
+                timestamp INTEGER NOT NULL,
                 success BOOLEAN NOT NULL,
                 error_message TEXT,
                 processing_time_ms REAL
@@ -98,10 +141,16 @@ def migrate_database():
         """)
         print("✓ Created healing_attempts table")
     
+    # Store timestamps as INTEGER unix microseconds (indexes are recreated below)
+    for table in ("healed", "feedback", "healing_attempts"):
+        if convert_timestamps_to_integer(cursor, table):
+            print(f"✓ Converted {table}.timestamp to integer microseconds")
+    
     # Create indexes
     try:
         cursor.execute("CREATE INDEX IF NOT EXISTS idx_healed_old_selector ON healed(old_selector)")
         cursor.execute("CREATE INDEX IF NOT EXISTS idx_healed_timestamp ON healed(timestamp DESC)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_healed_ts_conf ON healed(timestamp, confidence)")
         cursor.execute("CREATE INDEX IF NOT EXISTS idx_feedback_healing_id ON feedback(healing_id)")
         print("✓ Created indexes")
     except Exception as e:
@@ -1,7 +1,7 @@
 """
 Pydantic models for request/response validation
 """
-from pydantic import BaseModel, Field, validator
+from pydantic import BaseModel, ConfigDict, Field, field_validator, model_validator
 from typing import List, Optional, Dict, Any
 from datetime import datetime
 from enum import Enum
@@ -34,25 +34,9 @@ class HealRequest(BaseModel):
     screenshot_path: Optional[str] = Field(None, description="Path to screenshot file")
     selector_type: Optional[SelectorType] = Field(SelectorType.MIXED, description="Type of selectors to generate")
     
-    @validator('failed_selector')
-    def validate_selector(cls, v):
-        if not v or not v.strip():
-            raise ValueError('Selector cannot be empty')
-        return v.strip()
-    
-    @validator('semantic_dom', always=True)
-    def validate_dom_source(cls, v, values):
-        """Ensure at least one DOM source is provided"""
-        html = values.get('html')
-        interactive = values.get('interactive_elements')
-        
-        if not any([html, v, interactive]):
-            raise ValueError('At least one of html, semantic_dom, or interactive_elements must be provided')
-        
-        return v
-    
-    class Config:
-        schema_extra = {
+    # Request models use Pydantic v2 validators so parsing stays in pydantic-core
+    model_config = ConfigDict(
+        json_schema_extra={
             "example": {
                 "failed_selector": "#submit-btn",
                 "semantic_dom": {
@@ -65,16 +49,47 @@ class HealRequest(BaseModel):
                 "selector_type": "mixed"
             }
         }
+    )
+    
+    @field_validator('failed_selector')
+    @classmethod
+    def validate_selector(cls, v):
+        if not v or not v.strip():
+            raise ValueError('Selector cannot be empty')
+        return v.strip()
+    
+    @model_validator(mode='after')
+    def validate_dom_source(self):
+        """Ensure at least one DOM source is provided"""
+        if not (self.html or self.semantic_dom or self.interactive_elements):
+            raise ValueError('At least one of html, semantic_dom, or interactive_elements must be provided')
+        return self
 
 class BatchHealRequest(BaseModel):
     """Request model for healing multiple selectors"""
-    selectors: List[HealRequest] = Field(..., min_items=1, max_items=10, description="List of selectors to heal")
+    selectors: List[HealRequest] = Field(..., min_length=1, max_length=10, description="List of selectors to heal")
+
+class PageHealBatchRequest(BaseModel):
+    """Request model for healing several failing selectors from the same page in one LLM call"""
+    selectors: List[str] = Field(..., min_length=1, max_length=20, description="Failing selectors from the same page")
+    html: Optional[str] = Field(None, min_length=1, description="Full HTML content of the page")
+    semantic_dom: Optional[Dict[str, Any]] = Field(None, description="Extracted semantic DOM (recommended - 76% smaller)")
+    page_url: Optional[str] = Field(None, description="URL of the page")
+    use_of_selector: Optional[Dict[str, str]] = Field(None, description="Optional usage context keyed by failing selector")
+    
+    @field_validator('selectors')
+    @classmethod
+    def validate_selector(cls, v):
+        if not all(s and s.strip() for s in v):
+            raise ValueError('Selector cannot be empty')
+        return [s.strip() for s in v]
     
-    @validator('selectors')
-    def validate_selectors(cls, v):
-        if len(v) > 10:
-            raise ValueError('Maximum 10 selectors allowed per batch request')
-        return v
+    @model_validator(mode='after')
+    def validate_dom_source(self):
+        """Ensure at least one DOM source is provided"""
+        if not (self.html or self.semantic_dom):
+            raise ValueError('At least one of html or semantic_dom must be provided')
+        return self
 
 class FeedbackRequest(BaseModel):
     """Request model for submitting feedback on a healed selector"""
@@ -0,0 +1,108 @@
+"""
+ASGI middleware for gzip-encoded request and response bodies
+Heal requests carry whole pages of HTML, which clients can send compressed.
+"""
+import zlib
+from starlette.middleware.gzip import GZipMiddleware
+
+# Largest body accepted after decompression (guards against gzip bombs)
+MAX_INFLATED_BYTES = 64 * 1024 * 1024
+
+
+class GzipRequestMiddleware:
+    """Decompress request bodies sent with `Content-Encoding: gzip` before routing"""
+
+    def __init__(self, app, max_size: int = MAX_INFLATED_BYTES):
+        self.app = app
+        self.max_size = max_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not any(
+            name == b"content-encoding" and value.strip().lower() == b"gzip"
+            for name, value in scope["headers"]
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        chunks = []
+        more_body = True
+        while more_body:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                return
+            chunks.append(message.get("body", b""))
+            more_body = message.get("more_body", False)
+
+        # 16 + MAX_WBITS: expect a gzip header and trailer
+        inflater = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        try:
+            body = inflater.decompress(b"".join(chunks), self.max_size + 1)
+        except zlib.error:
+            await _reject(send, 400, b'{"detail":"Invalid gzip request body"}')
+            return
+        if len(body) > self.max_size or inflater.unconsumed_tail:
+            await _reject(send, 413, b'{"detail":"Decompressed request body too large"}')
+            return
+        if not inflater.eof:  # Stream ended before the gzip trailer: truncated body
+            await _reject(send, 400, b'{"detail":"Invalid gzip request body"}')
+            return
+
+        headers = [
+            (name, value) for name, value in scope["headers"]
+            if name not in (b"content-encoding", b"content-length")
+        ]
+        headers.append((b"content-length", str(len(body)).encode("latin-1")))
+
+        body_sent = False
+
+        async def inflated_receive():
+            nonlocal body_sent
+            if body_sent:
+                return await receive()
+            body_sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+
+        await self.app({**scope, "headers": headers}, inflated_receive, send)
+
+
+async def _reject(send, status: int, body: bytes):
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode("latin-1"))],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+def accepts_gzip(accept_encoding: str) -> bool:
+    """Whether an Accept-Encoding header allows gzip (an explicit q=0 refuses it; '*' covers it)"""
+    wildcard = False
+    for item in accept_encoding.split(","):
+        coding, _, params = item.partition(";")
+        coding = coding.strip().lower()
+        q = 1.0
+        for param in params.split(";"):
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if coding in ("gzip", "x-gzip"):
+            return q > 0
+        if coding == "*":
+            wildcard = q > 0
+    return wildcard
+
+
+class GzipResponseMiddleware(GZipMiddleware):
+    """Starlette's GZipMiddleware, but honouring q-values (it compresses whenever "gzip" appears)"""
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http":
+            headers = scope["headers"]
+            accept = b",".join(value for name, value in headers if name == b"accept-encoding")
+            if b"gzip" in accept and not accepts_gzip(accept.decode("latin-1")):
+                # Hide the refused coding so the identity responder is chosen
+                scope = {**scope, "headers": [(n, v) for n, v in headers if n != b"accept-encoding"]}
+        await super().__call__(scope, receive, send)
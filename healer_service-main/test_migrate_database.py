@@ -0,0 +1,56 @@
+"""
+Tests for the TEXT -> INTEGER timestamp migration
+
+Usage:
+    python -m unittest test_migrate_database
+"""
+
+import sqlite3
+import unittest
+
+from migrate_database import convert_timestamps_to_integer
+
+
+class ConvertTimestampsTest(unittest.TestCase):
+    def setUp(self):
+        self.conn = sqlite3.connect(":memory:")
+        self.cursor = self.conn.cursor()
+        self.cursor.execute("""
+            CREATE TABLE healing_attempts (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                failed_selector TEXT NOT NULL,
+                timestamp TEXT NOT NULL
+            )
+        """)
+
+    def tearDown(self):
+        self.conn.close()
+
+    def test_converts_iso_and_digit_rows(self):
+        self.cursor.executemany(
+            "INSERT INTO healing_attempts (failed_selector, timestamp) VALUES (?, ?)",
+            [
+                ("#iso", "2026-01-11T10:28:54.123456"),
+                ("#iso-short", "2026-01-11T10:28:54.5"),
+                ("#iso-whole", "2026-01-11T10:28:54"),
+                ("#digits", "1768127334123456"),
+            ]
+        )
+
+        self.assertTrue(convert_timestamps_to_integer(self.cursor, "healing_attempts"))
+
+        self.cursor.execute("SELECT failed_selector, timestamp, typeof(timestamp) FROM healing_attempts ORDER BY id")
+        self.assertEqual(self.cursor.fetchall(), [
+            ("#iso", 1768127334123456, "integer"),
+            ("#iso-short", 1768127334500000, "integer"),
+            ("#iso-whole", 1768127334000000, "integer"),
+            ("#digits", 1768127334123456, "integer"),
+        ])
+
+    def test_skips_integer_column(self):
+        self.assertTrue(convert_timestamps_to_integer(self.cursor, "healing_attempts"))
+        self.assertFalse(convert_timestamps_to_integer(self.cursor, "healing_attempts"))
+
+
+if __name__ == "__main__":
+    unittest.main()
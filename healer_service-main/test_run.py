@@ -7,8 +7,9 @@ Usage:
     2. Run this test: python test_run.py
 """
 
+import gzip
 import requests
-import json
+import orjson
 from main import DOMExtractor
 print("=" * 80)
 print("HEALER SERVICE - API TEST")
@@ -54,7 +55,15 @@ try:
     # Make API call
     print("\n3. Calling Healer API...")
     print(f"    POST {API_URL}")
-    response = requests.post(API_URL, json=payload, timeout=30)
+    # Page HTML compresses ~10x, so send the body gzip-encoded (the service inflates it)
+    body = gzip.compress(orjson.dumps(payload))
+    print(f"    Request body: {len(body):,} bytes gzipped")
+    response = requests.post(
+        API_URL,
+        data=body,
+        headers={"Content-Type": "application/json", "Content-Encoding": "gzip"},
+        timeout=30
+    )
     
     # Check response
     print(f"\n4. Response received:")
@@ -99,7 +108,7 @@ try:
         print("\n" + "=" * 80)
         print("Full JSON Response:")
         print("=" * 80)
-        print(json.dumps(result, indent=2))
+        print(orjson.dumps(result, option=orjson.OPT_INDENT_2).decode())
         
     else:
         print("\n" + "=" * 80)
@@ -2,27 +2,132 @@
 Screenshot analysis with vision models
 """
 import os
-import base64
-import requests
-from typing import Optional, Dict, Any
+import asyncio
+from functools import lru_cache
+from typing import Optional, Dict, Any, List
+import httpx
+import orjson
 from config import Config
 from logger import logger
+from llm_client import get_client, parse_json_content
+
+try:
+    from pybase64 import b64encode  # SIMD-accelerated, same output as the stdlib
+except ImportError:
+    from base64 import b64encode
+
+# Gateway errors worth retrying, and how many extra attempts to make
+_RETRY_STATUSES = frozenset({502, 503, 504})
+_RETRIES = 2
+
+# Bytes read per base64 step (57 KiB, divisible by 3)
+_ENCODE_CHUNK = 57 * 1024
+
+# Fixed prompt text, built once; only the selector and URL lines vary per call
+_VISION_SYSTEM_PROMPT = (
+    "You are an expert UI/UX analyst. Analyze the screenshot and identify "
+    "UI elements that match the failed selector context. Describe the visual "
+    "characteristics, position, and surrounding elements."
+)
+_VISION_USER_HEAD = """
+Analyze this screenshot and help identify the element that matches this selector:
+"""
+_VISION_USER_TAIL = """
+Please provide:
+1. Description of the likely target element
+2. Visual characteristics (color, size, position)
+3. Nearby elements or landmarks
+4. Suggested stable attributes to use for selection
+
+Return your analysis in a concise, structured format.
+"""
+_VISION_BATCH_FORMAT = """
+Answer for each numbered selector separately. Return ONLY valid JSON in this exact format,
+with exactly {count} strings in selector order:
+{{"analyses": ["<analysis for selector 1>", "<analysis for selector 2>", ...]}}
+"""
+
+@lru_cache(maxsize=16)
+def _encode_cached(image_path: str, mtime_ns: int, size: int) -> str:
+    """Base64 of one version of a file; mtime and size in the key invalidate rewritten screenshots"""
+    encoded = bytearray()
+    with open(image_path, "rb") as image_file:
+        # Chunks are a multiple of 3 bytes, so each encodes without padding and the whole
+        # file never has to be held in memory alongside its encoding
+        for chunk in iter(lambda: image_file.read(_ENCODE_CHUNK), b""):
+            encoded += b64encode(chunk)
+    return encoded.decode('ascii')
 
 def encode_image_to_base64(image_path: str) -> Optional[str]:
-    """Encode image file to base64 string"""
+    """Encode image file to base64 string (cached, batches often share one screenshot)"""
     try:
-        if not os.path.exists(image_path):
+        try:
+            st = os.stat(image_path)
+        except FileNotFoundError:
             logger.warning(f"Screenshot file not found: {image_path}", extra={'request_id': 'system'})
             return None
         
-        with open(image_path, "rb") as image_file:
-            encoded = base64.b64encode(image_file.read()).decode('utf-8')
-            return encoded
+        return _encode_cached(image_path, st.st_mtime_ns, st.st_size)
     except Exception as e:
         logger.error(f"Failed to encode image: {e}", extra={'request_id': 'system'}, exc_info=True)
         return None
 
-def analyze_screenshot_with_vision(
+async def _post_vision(user_prompt: str, image_base64: str, max_tokens: int) -> str:
+    """Send one prompt plus one screenshot to the vision model and return the reply text"""
+    headers = {
+        "Authorization": f"Bearer {Config.OPENROUTER_API_KEY}",
+        "Content-Type": "application/json"
+    }
+    
+    payload = {
+        "model": Config.VISION_MODEL,
+        "messages": [
+            {"role": "system", "content": _VISION_SYSTEM_PROMPT},
+            {
+                "role": "user",
+                "content": [
+                    {"type": "text", "text": user_prompt},
+                    {
+                        "type": "image_url",
+                        "image_url": {
+                            "url": f"data:image/png;base64,{image_base64}"
+                        }
+                    }
+                ]
+            }
+        ],
+        "max_tokens": max_tokens,
+        "temperature": 0.0
+    }
+    
+    # orjson writes the multi-MB image payload straight to bytes
+    body = orjson.dumps(payload)
+    for attempt in range(_RETRIES + 1):
+        response = await get_client().post(
+            Config.OPENROUTER_URL,
+            headers=headers,
+            content=body,
+            timeout=Config.LLM_TIMEOUT
+        )
+        if response.status_code not in _RETRY_STATUSES or attempt == _RETRIES:
+            break
+        await asyncio.sleep(0.2 * 2 ** attempt)
+    response.raise_for_status()
+    
+    result = response.json()
+    return result["choices"][0]["message"]["content"]
+
+def _vision_error(e: Exception) -> Dict[str, Any]:
+    if isinstance(e, httpx.TimeoutException):
+        logger.error("Vision API timeout", extra={'request_id': 'system'})
+        return {"success": False, "error": "Vision API timeout"}
+    if isinstance(e, httpx.HTTPError):
+        logger.error(f"Vision API request failed: {e}", extra={'request_id': 'system'}, exc_info=True)
+    else:
+        logger.error(f"Screenshot analysis failed: {e}", extra={'request_id': 'system'}, exc_info=True)
+    return {"success": False, "error": str(e)}
+
+async def analyze_screenshot_with_vision(
     screenshot_path: str,
     failed_selector: str,
     page_url: Optional[str] = None
@@ -40,70 +145,15 @@ def analyze_screenshot_with_vision(
     if not screenshot_path:
         return None
     
-    # Encode image
-    image_base64 = encode_image_to_base64(screenshot_path)
+    # Encode image (file read + base64) off the event loop
+    image_base64 = await asyncio.to_thread(encode_image_to_base64, screenshot_path)
     if not image_base64:
         return None
     
     try:
         # Build vision prompt
-        system_prompt = (
-            "You are an expert UI/UX analyst. Analyze the screenshot and identify "
-            "UI elements that match the failed selector context. Describe the visual "
-            "characteristics, position, and surrounding elements."
-        )
-        
-        user_prompt = f"""
-Analyze this screenshot and help identify the element that matches this selector:
-Failed selector: {failed_selector}
-Page URL: {page_url or 'N/A'}
-
-Please provide:
-1. Description of the likely target element
-2. Visual characteristics (color, size, position)
-3. Nearby elements or landmarks
-4. Suggested stable attributes to use for selection
-
-Return your analysis in a concise, structured format.
-"""
-        
-        # Call vision model
-        headers = {
-            "Authorization": f"Bearer {Config.OPENROUTER_API_KEY}",
-            "Content-Type": "application/json"
-        }
-        
-        payload = {
-            "model": Config.VISION_MODEL,
-            "messages": [
-                {"role": "system", "content": system_prompt},
-                {
-                    "role": "user",
-                    "content": [
-                        {"type": "text", "text": user_prompt},
-                        {
-                            "type": "image_url",
-                            "image_url": {
-                                "url": f"data:image/png;base64,{image_base64}"
-                            }
-                        }
-                    ]
-                }
-            ],
-            "max_tokens": 500,
-            "temperature": 0.0
-        }
-        
-        response = requests.post(
-            Config.OPENROUTER_URL,
-            headers=headers,
-            json=payload,
-            timeout=Config.LLM_TIMEOUT
-        )
-        response.raise_for_status()
-        
-        result = response.json()
-        analysis_text = result["choices"][0]["message"]["content"]
+        user_prompt = _VISION_USER_HEAD + f"Failed selector: {failed_selector}\nPage URL: {page_url or 'N/A'}\n" + _VISION_USER_TAIL
+        analysis_text = await _post_vision(user_prompt, image_base64, 500)
         
         logger.info("Screenshot analysis completed successfully", extra={'request_id': 'system'})
         
@@ -112,20 +162,113 @@ Return your analysis in a concise, structured format.
             "analysis": analysis_text,
             "model_used": Config.VISION_MODEL
         }
-        
-    except requests.exceptions.Timeout:
-        logger.error("Vision API timeout", extra={'request_id': 'system'})
-        return {"success": False, "error": "Vision API timeout"}
+    except Exception as e:
+        return _vision_error(e)
+
+async def analyze_screenshot_for_selectors(
+    screenshot_path: str,
+    failed_selectors: List[str],
+    page_url: Optional[str] = None
+) -> List[Optional[Dict[str, Any]]]:
+    """
+    Analyze one screenshot for several failing selectors in a single vision call
     
-    except requests.exceptions.RequestException as e:
-        logger.error(f"Vision API request failed: {e}", extra={'request_id': 'system'}, exc_info=True)
-        return {"success": False, "error": str(e)}
+    The image is sent once with a numbered selector list. If the reply cannot be mapped back
+    to the selectors, each selector is analyzed on its own instead.
+    
+    Returns:
+        One analysis result (as from analyze_screenshot_with_vision) per selector, in order
+    """
+    if len(failed_selectors) == 1:
+        return [await analyze_screenshot_with_vision(screenshot_path, failed_selectors[0], page_url)]
     
+    image_base64 = await asyncio.to_thread(encode_image_to_base64, screenshot_path)
+    if not image_base64:
+        return [None] * len(failed_selectors)
+    
+    selector_lines = "\n".join(f"{i}. {sel}" for i, sel in enumerate(failed_selectors, 1))
+    user_prompt = (
+        _VISION_USER_HEAD.replace("the element that matches this selector", "the element matching each of these selectors")
+        + f"Failed selectors:\n{selector_lines}\nPage URL: {page_url or 'N/A'}\n"
+        + _VISION_USER_TAIL
+        + _VISION_BATCH_FORMAT.format(count=len(failed_selectors))
+    )
+    try:
+        content = await _post_vision(user_prompt, image_base64, 500 * len(failed_selectors))
+        analyses = parse_json_content(content).get("analyses")
+        if not isinstance(analyses, list) or len(analyses) != len(failed_selectors):
+            raise ValueError(f"expected {len(failed_selectors)} analyses")
+    except (ValueError, AttributeError) as e:
+        logger.warning(f"Batched screenshot analysis unusable ({e}), analyzing selectors separately",
+                       extra={'request_id': 'system'})
+        return list(await asyncio.gather(*(
+            analyze_screenshot_with_vision(screenshot_path, sel, page_url) for sel in failed_selectors
+        )))
     except Exception as e:
-        logger.error(f"Screenshot analysis failed: {e}", extra={'request_id': 'system'}, exc_info=True)
-        return {"success": False, "error": str(e)}
+        return [_vision_error(e)] * len(failed_selectors)
+    
+    logger.info(f"Screenshot analysis completed for {len(failed_selectors)} selectors in one call",
+                extra={'request_id': 'system'})
+    return [
+        {"success": True, "analysis": str(text), "model_used": Config.VISION_MODEL}
+        for text in analyses
+    ]
 
-def get_visual_context_for_healing(
+
+class VisionBatcher:
+    """Collects concurrent analyses of the same screenshot for a short window and sends them as one call"""
+
+    def __init__(self, window_ms: float, max_size: int):
+        self.window = window_ms / 1000
+        self.max_size = max(1, max_size)
+        self._pending = {}   # (screenshot path, page URL) -> [(failed selector, future)]
+        self._timers = {}
+        self._tasks = set()  # Keeps in-flight flushes referenced
+
+    async def submit(self, screenshot_path: str, failed_selector: str, page_url: Optional[str]):
+        loop = asyncio.get_running_loop()
+        key = (screenshot_path, page_url)
+        future = loop.create_future()
+        self._pending.setdefault(key, []).append((failed_selector, future))
+        if len(self._pending[key]) >= self.max_size:
+            self._flush(key)
+        elif key not in self._timers:
+            self._timers[key] = loop.call_later(self.window, self._flush, key)
+        return await future
+
+    def _flush(self, key):
+        timer = self._timers.pop(key, None)
+        if timer is not None:
+            timer.cancel()
+        batch = self._pending.pop(key, [])
+        if batch:
+            task = asyncio.get_running_loop().create_task(self._run(key, batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, key, batch):
+        screenshot_path, page_url = key
+        try:
+            results = await analyze_screenshot_for_selectors(
+                screenshot_path, [sel for sel, _ in batch], page_url
+            )
+        except asyncio.CancelledError:
+            for _, future in batch:
+                future.cancel()
+            raise
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+
+_vision_batcher = VisionBatcher(Config.LLM_BATCH_WINDOW_MS, Config.LLM_BATCH_MAX_SIZE)
+
+async def get_visual_context_for_healing(
     screenshot_path: Optional[str],
     failed_selector: str,
     page_url: Optional[str] = None
@@ -133,13 +276,18 @@ def get_visual_context_for_healing(
     """
     Get visual context from screenshot to enhance healing prompt
     
+    Concurrent heals of the same screenshot (e.g. one /heal-batch page) share one vision call.
+    
     Returns:
         String with visual context to add to LLM prompt, or empty string if unavailable
     """
     if not screenshot_path or not Config.ENABLE_SCREENSHOT_ANALYSIS:
         return ""
     
-    analysis = analyze_screenshot_with_vision(screenshot_path, failed_selector, page_url)
+    if Config.LLM_BATCH_WINDOW_MS > 0:
+        analysis = await _vision_batcher.submit(screenshot_path, failed_selector, page_url)
+    else:
+        analysis = await analyze_screenshot_with_vision(screenshot_path, failed_selector, page_url)
     
     if analysis and analysis.get("success"):
         context = f"""
@@ -1,94 +1,158 @@
 """
 XPath selector generation and utilities
 """
-from bs4 import BeautifulSoup
+from lxml import etree
 from typing import List, Tuple
+from functools import lru_cache
+from itertools import chain
+import threading
 import re
 
+# Elements whose content BeautifulSoup's get_text() leaves out of their ancestors' text
+_CODE_TAGS = frozenset({"script", "style"})
+_NON_TEXT_TAGS = _CODE_TAGS | {"template"}
+_TEXT_LIMIT = 60
+
+# lxml parsers are reusable but not thread-safe; callers run in worker threads, so keep one per thread
+_parser_local = threading.local()
+
+def _html_parser() -> etree.HTMLParser:
+    """This thread's HTML parser (comments are dropped at parse time; they never yield XPaths)"""
+    parser = getattr(_parser_local, "parser", None)
+    if parser is None:
+        parser = _parser_local.parser = etree.HTMLParser(remove_comments=True)
+    return parser
+
+def _bs_string(piece: str) -> str:
+    """BeautifulSoup stores whitespace-only strings as a single newline (or space); match that"""
+    if piece.isspace():
+        return "\n" if "\n" in piece else " "
+    return piece
+
+def _texts(el, skip=_NON_TEXT_TAGS):
+    """Text pieces under `el` in document order, skipping comments and `skip` elements' content"""
+    for child in el:
+        if isinstance(child.tag, str) and child.tag not in skip:
+            if child.text:
+                yield child.text
+            yield from _texts(child, skip)
+        if child.tail:
+            yield child.tail
+
+def _short_text(el) -> str:
+    """
+    Stripped text of `el` as BeautifulSoup's get_text() gives it, or "" once it reaches _TEXT_LIMIT chars.
+    
+    Only short texts become XPaths, so long subtrees (e.g. <html>, <body>) stop being read early.
+    A <template>'s text is all of its non-code content, which in turn gives its descendants no text.
+    """
+    if el.tag in _CODE_TAGS:
+        text = _bs_string(el.text or "")
+    elif next(el.iterancestors("template"), None) is not None:
+        return ""
+    else:
+        text = ""
+        skip = _CODE_TAGS if el.tag == "template" else _NON_TEXT_TAGS
+        for piece in chain((el.text or "",), _texts(el, skip)):
+            text += _bs_string(piece)
+            if len(text) >= _TEXT_LIMIT and len(text.strip()) >= _TEXT_LIMIT:
+                return ""
+    text = text.strip()
+    return text if len(text) < _TEXT_LIMIT else ""
+
 def generate_xpath_from_dom(html: str, limit: int = 30) -> List[str]:
-    """Generate XPath selectors from HTML DOM"""
-    soup = BeautifulSoup(html, "lxml")
-    xpaths = []
+    """Generate XPath selectors from HTML DOM (parsed and walked with lxml)"""
+    root = etree.HTML(html, _html_parser()) if html and html.strip() else None
+    if root is None:
+        return []
+    unique_xpaths = {}  # Ordered set; the walk stops once `limit` distinct XPaths exist
     
-    for el in soup.find_all(True):
+    for el in root.iter():
+        tag = el.tag
+        if not isinstance(tag, str):  # Processing instructions
+            continue
+        attrib = el.attrib
+        xpaths = []
+        
         # XPath by ID
-        if el.get("id"):
-            xpaths.append(f"//*[@id='{el.get('id')}']")
+        value = attrib.get("id")
+        if value:
+            xpaths.append(f"//*[@id='{value}']")
         
         # XPath by data-testid
-        if el.get("data-testid"):
-            xpaths.append(f"//*[@data-testid='{el.get('data-testid')}']")
+        value = attrib.get("data-testid")
+        if value:
+            xpaths.append(f"//*[@data-testid='{value}']")
         
         # XPath by aria-label
-        if el.get("aria-label"):
-            xpaths.append(f"//*[@aria-label='{el.get('aria-label')}']")
+        value = attrib.get("aria-label")
+        if value:
+            xpaths.append(f"//*[@aria-label='{value}']")
         
         # XPath by role
-        if el.get("role"):
-            xpaths.append(f"//*[@role='{el.get('role')}']")
+        value = attrib.get("role")
+        if value:
+            xpaths.append(f"//*[@role='{value}']")
         
-        # XPath by class
-        if el.get("class"):
-            classes = " ".join(el.get("class"))
+        # XPath by class (whitespace-normalised, as BeautifulSoup split it)
+        classes = " ".join(attrib.get("class", "").split())
+        if classes:
             xpaths.append(f"//*[@class='{classes}']")
         
         # XPath by text content
-        text = (el.get_text() or "").strip()
-        if text and len(text) < 60 and len(text) > 0:
+        text = _short_text(el)
+        if text:
             # Escape quotes in text
             text_escaped = text.replace("'", "\\'")
-            xpaths.append(f"//{el.name}[contains(text(), '{text_escaped}')]")
-            xpaths.append(f"//{el.name}[text()='{text_escaped}']")
+            xpaths.append(f"//{tag}[contains(text(), '{text_escaped}')]")
+            xpaths.append(f"//{tag}[text()='{text_escaped}']")
         
         # XPath by name attribute (for form elements)
-        if el.get("name"):
-            xpaths.append(f"//*[@name='{el.get('name')}']")
+        value = attrib.get("name")
+        if value:
+            xpaths.append(f"//*[@name='{value}']")
         
         # XPath by type (for inputs)
-        if el.name == "input" and el.get("type"):
-            xpaths.append(f"//input[@type='{el.get('type')}']")
+        if tag == "input" and attrib.get("type"):
+            xpaths.append(f"//input[@type='{attrib.get('type')}']")
         
         # XPath by placeholder
-        if el.get("placeholder"):
-            xpaths.append(f"//*[@placeholder='{el.get('placeholder')}']")
+        value = attrib.get("placeholder")
+        if value:
+            xpaths.append(f"//*[@placeholder='{value}']")
             
         # XPath by alt (for images)
-        if el.get("alt"):
-            xpaths.append(f"//*[@alt='{el.get('alt')}']")
+        value = attrib.get("alt")
+        if value:
+            xpaths.append(f"//*[@alt='{value}']")
             
         # XPath by title
-        if el.get("title"):
-            xpaths.append(f"//*[@title='{el.get('title')}']")
-    
-    # Deduplicate while preserving order
-    seen = set()
-    unique_xpaths = []
-    for xpath in xpaths:
-        if xpath not in seen:
-            seen.add(xpath)
-            unique_xpaths.append(xpath)
-        if len(unique_xpaths) >= limit:
-            break
-    
-    return unique_xpaths
+        value = attrib.get("title")
+        if value:
+            xpaths.append(f"//*[@title='{value}']")
+        
+        for xpath in xpaths:
+            unique_xpaths[xpath] = None
+            if len(unique_xpaths) >= limit:
+                return list(unique_xpaths)
+    
+    return list(unique_xpaths)
+
+# Positional predicate such as [1], [2]
+_POSITION_RE = re.compile(r'\[\d+\]')
 
+@lru_cache(maxsize=4096)
 def is_xpath(selector: str) -> bool:
-    """Detect if a selector is XPath"""
-    xpath_indicators = [
-        selector.startswith("//"),
-        selector.startswith("/"),
-        "//" in selector,
-        "@" in selector,
-        "[" in selector and "]" in selector and "@" in selector
-    ]
-    return any(xpath_indicators)
+    """Detect if a selector is XPath (a leading '/', a '//' step, or an '@' attribute axis)"""
+    return selector.startswith("/") or "//" in selector or "@" in selector
 
+@lru_cache(maxsize=4096)
 def xpath_stability_score(xpath: str) -> float:
     """Calculate stability score for XPath selector"""
     score = 1.0
     
     # Penalize position-based selectors
-    if re.search(r'\[\d+\]', xpath):  # e.g., [1], [2]
+    if _POSITION_RE.search(xpath):  # e.g., [1], [2]
         score -= 0.3
     
     # Penalize complex paths (too many levels)
@@ -103,7 +167,7 @@ def xpath_stability_score(xpath: str) -> float:
     # Bonus for stable attributes
     if "@data-testid" in xpath:
         score += 0.2
-    if "@aria-label" in xpath or "@aria-" in xpath:
+    if "@aria-" in xpath:  # Covers @aria-label
         score += 0.15
     if "@id" in xpath:
         score += 0.1
@@ -112,6 +176,7 @@ def xpath_stability_score(xpath: str) -> float:
     
     return max(min(score, 1.0), 0.0)
 
+@lru_cache(maxsize=4096)
 def xpath_semantic_score(xpath: str) -> float:
     """Calculate semantic score for XPath selector"""
     score = 0.0